@@ -0,0 +1,100 @@
+import threading
+
+from VideoStream import VideoStream
+
+# Client feedback thresholds
+DOWNSWITCH_LOSS = 0.05       #step down when more packets than this are lost
+UPSWITCH_LOSS = 0.01         #step up only below this loss...
+DOWNSWITCH_FPS_RATIO = 0.8   #...and when the client shows this share of the frame rate
+UPSWITCH_REPORTS = 3         #consecutive good reports before stepping up
+
+
+class AdaptiveStream:
+    """A VideoStream over a rendition ladder that can switch rendition between frames.
+
+    Renditions are converted from the same source at the same frame rate, so
+    frame numbers line up and a switch continues at the same frame in the
+    new rendition. Renditions other than the current one are opened on
+    first use.
+    """
+
+    def __init__(self, renditions, **kwargs):
+        self.renditions = renditions    #[(name, path)] best first
+        self.kwargs = kwargs            #VideoStream options for every rendition
+        self.streams = [None] * len(renditions)
+        self.lock = threading.Lock()
+        self.current = 0
+        self.goodReports = 0
+        self.stream = self._open(0)
+        self.frame_rate = self.stream.frame_rate
+
+    def _open(self, index):
+        if self.streams[index] is None:
+            self.streams[index] = VideoStream(self.renditions[index][1], **self.kwargs)
+        return self.streams[index]
+
+    @property
+    def filename(self):
+        return self.stream.filename
+
+    def rendition(self):
+        return self.renditions[self.current][0]
+
+    def switch(self, index):
+        """Continue from the current frame in another rendition, returns True if it changed.
+
+        Raises IOError, staying at the current rendition, if the other one
+        cannot be opened.
+        """
+        index = max(0, min(len(self.renditions) - 1, index))
+        if index == self.current:
+            return False
+        try:
+            stream = self._open(index)
+        except OSError:
+            print(f"Cannot open rendition {self.renditions[index][0]}, staying at {self.rendition()}")
+            raise
+        with self.lock:
+            stream.set_frame(self.stream.frameNbr())
+            self.stream = stream
+            self.current = index
+        print(f"Switched to rendition {self.rendition()}")
+        return True
+
+    def report(self, loss, fps):
+        """Apply client feedback, returns True if the rendition changed."""
+        if loss > DOWNSWITCH_LOSS or fps < DOWNSWITCH_FPS_RATIO * self.frame_rate:
+            self.goodReports = 0
+            return self.switch(self.current + 1)
+        if loss < UPSWITCH_LOSS:
+            self.goodReports += 1
+            if self.goodReports >= UPSWITCH_REPORTS:
+                self.goodReports = 0
+                return self.switch(self.current - 1)
+        else:
+            self.goodReports = 0
+        return False
+
+    def nextFrame(self):
+        with self.lock:
+            return self.stream.nextFrame()
+
+    def frameNbr(self):
+        return self.stream.frameNbr()
+
+    def get_total_frames(self):
+        return self.stream.get_total_frames()
+
+    def byte_rate(self):
+        return self.stream.byte_rate()
+
+    def set_frame(self, frame_number):
+        with self.lock:
+            return self.stream.set_frame(frame_number)
+
+    def close(self):
+        """Close every rendition opened so far."""
+        with self.lock:
+            for stream in self.streams:
+                if stream is not None:
+                    stream.close()
@@ -0,0 +1,109 @@
+import threading
+import time
+
+BURST_SECONDS = 1.0    #seconds of budget the bandwidth bucket can save up for bursts
+
+
+class AdmissionControl:
+    """Server-wide limits checked before a session or stream gets any resources.
+
+    Sessions are counted from connection to teardown and playing streams from
+    PLAY to PAUSE, SCRUB or teardown. A PLAY also reserves the stream's
+    average bit rate against the bandwidth budget, so a new stream is turned
+    away rather than slowing down the ones already playing. The budget is
+    also enforced on the frames actually sent by a token bucket shared by
+    every sender, for streams whose bit rate peaks above their average.
+    A limit of 0 disables it.
+    """
+
+    def __init__(self, maxSessions=0, maxPlaying=0, bandwidth=0):
+        self.maxSessions = maxSessions
+        self.maxPlaying = maxPlaying
+        self.bandwidth = bandwidth    #bytes per second
+        self.lock = threading.Lock()
+        self.sessions = 0
+        self.playing = 0
+        self.reserved = 0.0           #bytes per second reserved by playing streams
+        self.rejected = {'sessions': 0, 'playing': 0, 'bandwidth': 0}
+        self.tokens = 0.0
+        self.refilled = time.monotonic()
+
+    def configure(self, maxSessions=0, maxPlaying=0, bandwidth=0):
+        with self.lock:
+            self.maxSessions = maxSessions
+            self.maxPlaying = maxPlaying
+            self.bandwidth = bandwidth
+            self.tokens = bandwidth * BURST_SECONDS
+
+    def admitSession(self):
+        """Count a new connection, returns False if the session cap is reached."""
+        with self.lock:
+            if self.maxSessions and self.sessions >= self.maxSessions:
+                self.rejected['sessions'] += 1
+                return False
+            self.sessions += 1
+            return True
+
+    def releaseSession(self):
+        with self.lock:
+            self.sessions -= 1
+
+    def admitPlay(self, rate):
+        """Reserve a stream of rate bytes per second, returns False if a cap or the budget is reached."""
+        with self.lock:
+            if self.maxPlaying and self.playing >= self.maxPlaying:
+                self.rejected['playing'] += 1
+                return False
+            if self.bandwidth and self.reserved + rate > self.bandwidth:
+                self.rejected['bandwidth'] += 1
+                return False
+            self.playing += 1
+            self.reserved += rate
+            return True
+
+    def releasePlay(self, rate):
+        with self.lock:
+            self.playing -= 1
+            self.reserved = self.reserved - rate if self.playing else 0.0    #no rounding residue when idle
+
+    def reserve(self, rate):
+        """Reserve bandwidth for a sender shared by playing streams, like a multicast channel.
+
+        The streams themselves are admitted with a rate of 0, and the
+        reservation must be released before the last of them.
+        """
+        with self.lock:
+            if self.bandwidth and self.reserved + rate > self.bandwidth:
+                self.rejected['bandwidth'] += 1
+                return False
+            self.reserved += rate
+            return True
+
+    def release(self, rate):
+        with self.lock:
+            self.reserved = max(0.0, self.reserved - rate)
+
+    def consume(self, nbytes):
+        """Take nbytes from the shared budget, returns False if the frame must not be sent."""
+        if not self.bandwidth:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.bandwidth * BURST_SECONDS,
+                              self.tokens + (now - self.refilled) * self.bandwidth)
+            self.refilled = now
+            if self.tokens < nbytes:
+                return False
+            self.tokens -= nbytes
+            return True
+
+    def stats(self):
+        with self.lock:
+            stats = {'sessions': self.sessions, 'playing': self.playing, 'reserved_bytes_per_second': self.reserved}
+            for reason, count in self.rejected.items():
+                stats[f'rejected_{reason}'] = count
+        return stats
+
+
+# Process-wide limits used by ServerWorker, configured by Server.py
+shared_admission = AdmissionControl()
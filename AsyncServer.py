@@ -0,0 +1,156 @@
+import asyncio
+import socket
+from collections import deque
+
+from ServerWorker import ServerWorker, REJECT_TIMEOUT, MAX_REQUEST_BODY
+from RtspParser import RtspParser, RtspParseError
+
+
+class AsyncServerWorker(ServerWorker, asyncio.Protocol):
+    """RTSP session driven by the event loop instead of per-client threads.
+
+    RTSP requests are handled by the inherited ServerWorker state machine,
+    only the transport hooks (replies, RTP pacing and sending) are replaced.
+    """
+
+    readAheadBlock = False    #an empty read-ahead ring skips the frame instead of stalling the loop
+
+    def __init__(self, server):
+        super().__init__({})
+        self.server = server
+        self.transport = None
+        self.loop = None
+        self.timer = None
+        self.interval = 0.0
+        self.deadline = 0.0
+        self.parser = RtspParser(maxBodySize=MAX_REQUEST_BODY)
+        self.requests = deque()    #pipelined requests waiting for the one being handled
+        self.handling = False      #a SETUP is being handled off the loop
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.loop = asyncio.get_running_loop()
+        self.clientInfo['rtspSocket'] = (None, transport.get_extra_info('peername'))
+        self.admitted = self.admission.admitSession()
+        if self.admitted:
+            self.server.sessions.add(self)
+            self.sessionRegistry.register(self, transport.get_extra_info('socket'))
+        else:
+            # Never registered, so nothing else would close a connection that stays silent
+            self.loop.call_later(REJECT_TIMEOUT, self.transport.close)
+
+    def data_received(self, data):
+        try:
+            messages = self.parser.feed(data)
+        except RtspParseError as e:
+            print("Malformed RTSP request:", e)
+            self.transport.close()
+            return
+        if not self.admitted:
+            # Over the session cap: answer 503 without creating any session state
+            for message in messages:
+                self.replyUnavailable(message)
+            if messages:
+                self.loop.call_soon(self.transport.close)
+            return
+        self.requests.extend(messages)
+        self.handleRequests()
+
+    def handleRequests(self):
+        """Handle queued requests in order, later ones wait while a SETUP runs off the loop."""
+        while self.requests and not self.handling:
+            message = self.requests.popleft()
+            if message.method == self.SETUP:
+                # SETUP may wait for a video conversion, keep it off the event loop
+                self.handling = True
+                future = self.loop.run_in_executor(None, self.handleRequest, message)
+                future.add_done_callback(self.requestHandled)
+            else:
+                self.handleRequest(message)
+
+    def requestHandled(self, future):
+        self.handling = False
+        if self.transport.is_closing():
+            # The connection ended during the SETUP, drop what it opened
+            self.closeStream()
+            self.serverMetrics.remove(self.metrics)
+            return
+        self.handleRequests()
+
+    def connection_lost(self, exc):
+        self.requests.clear()
+        ServerWorker.close(self, 'disconnected')
+        self.server.sessions.discard(self)
+
+    def close(self, reason='disconnected'):
+        # TEARDOWN comes from the loop but the reaper from its own thread, end the session on the loop
+        self.loop.call_soon_threadsafe(ServerWorker.close, self, reason)
+
+    def closeConnection(self):
+        self.transport.close()    #after the replies already written
+
+    def startRtp(self):
+        """Schedule frame delivery on the event loop."""
+        self.stopRtp()
+        if self.sharedDelivery():
+            ServerWorker.startRtp(self)    #shared channels are paced by the frame scheduler
+            return
+        self.interval = 1.0 / self.frameRate()
+        self.deadline = self.loop.time() + self.interval
+        self.timer = self.loop.call_at(self.deadline, self.sendRtp)
+
+    def stopRtp(self):
+        """Cancel any pending frame delivery."""
+        ServerWorker.stopRtp(self)
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+
+    def sendRtp(self):
+        """Send the frame that is due and schedule the next deadline."""
+        # Deadlines stay on a fixed grid, frames missed while late are skipped
+        lateness = self.loop.time() - self.deadline
+        skipped = int(lateness // self.interval)
+        self.sendFrame(skipped, lateness)
+        if self.timer:
+            self.deadline += (skipped + 1) * self.interval
+            self.timer = self.loop.call_at(self.deadline, self.sendRtp)
+
+    def sendPacket(self, packet, address):
+        try:
+            self.server.rtpSocket.sendmsg(packet, (), 0, address)
+        except BlockingIOError:
+            self.metrics.count('packets_dropped')    #send buffer full, late video is useless anyway
+        except OSError as e:
+            self.metrics.count('packets_dropped')
+            print("RTP send error:", e)
+
+    def sendRtspReply(self, reply):
+        # Replies may come from the SETUP executor thread
+        self.loop.call_soon_threadsafe(self.transport.write, reply)
+
+
+class AsyncServer:
+    """RTSP/RTP server running every session on a single event loop."""
+
+    def __init__(self, port, backlog=100):
+        self.port = port
+        self.backlog = backlog
+        self.sessions = set()
+        self.rtpSocket = None    #single non-blocking UDP socket shared by every session
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        # Sent to directly with sendmsg, a datagram transport would join the buffers first
+        self.rtpSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.rtpSocket.setblocking(False)
+        server = await loop.create_server(
+            lambda: AsyncServerWorker(self), '', self.port, backlog=self.backlog)
+        async with server:
+            await server.serve_forever()
+
+    def main(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
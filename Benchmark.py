@@ -0,0 +1,303 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+from typing import Callable, Dict, Tuple
+
+from VideoConverter import VideoConverter
+from RtpPacket import RtpPacket
+from RtpJpeg import RtpJpegPacketizer
+from VideoStream import VideoStream
+from FrameCache import FrameCache
+from FrameIndex import index_path
+
+MB = 1024 * 1024
+
+
+def make_jpeg_like_frame(size: int, rng: random.Random) -> bytes:
+    """Returns a frame that frames like a JPEG: SOI, byte-stuffed entropy data, EOI"""
+    body = bytearray(rng.randbytes(size - 4))
+    # Entropy-coded data never contains a bare marker, 0xFF is followed by 0x00
+    body = body.replace(b'\xff', b'\xff\x00')[:size - 4]
+    if body.endswith(b'\xff'):
+        body[-1] = 0
+    return b'\xff\xd8' + bytes(body) + b'\xff\xd9'
+
+
+def write_intermediate(path: str, size_mb: int, frame_size: int = 40 * 1024, seed: int = 0) -> int:
+    """Writes a raw ffmpeg-style MJPEG stream of about size_mb, returns its size"""
+    rng = random.Random(seed)
+    frames = [make_jpeg_like_frame(frame_size + rng.randrange(-4096, 4096), rng) for _ in range(64)]
+    target = size_mb * MB
+    written = 0
+    with open(path, 'wb') as f:
+        while written < target:
+            frame = frames[rng.randrange(len(frames))]
+            f.write(frame)
+            written += len(frame)
+    return written
+
+
+def legacy_process_mjpeg(input_file: str, output_file: str,
+                         chunk_size: int = 10 * 1024 * 1024) -> Tuple[bool, int]:
+    """Byte-at-a-time _process_mjpeg from before the bulk scanner, kept as a reference"""
+    converter = VideoConverter()
+    with open(input_file, 'rb') as in_f, open(output_file, 'wb') as out_f:
+        buffer = bytearray()
+        frames_processed = 0
+
+        while True:
+            chunk = in_f.read(chunk_size)
+            if not chunk:
+                break
+
+            buffer.extend(chunk)
+            pos = 0
+
+            while pos < len(buffer) - 1:
+                if buffer[pos] == 0xFF and buffer[pos + 1] == 0xD8:
+                    end_pos = pos + 2
+                    while end_pos < len(buffer) - 1:
+                        if buffer[end_pos] == 0xFF and buffer[end_pos + 1] == 0xD9:
+                            frame_data = buffer[pos:end_pos + 2]
+                            size_str = converter._prefix_with_zeroes(str(len(frame_data)), 5)
+                            out_f.write(size_str.encode())
+                            out_f.write(frame_data)
+                            frames_processed += 1
+                            print(f"\rProcessed frames: {frames_processed}", end='')
+                            pos = end_pos + 2
+                            break
+                        end_pos += 1
+                    else:
+                        break
+                else:
+                    pos += 1
+
+            buffer = buffer[pos:]
+
+        return True, frames_processed
+
+
+def time_process_mjpeg(process, input_file: str, output_file: str) -> Tuple[float, int]:
+    """Runs one reframing pass with its progress output silenced, returns (seconds, frames)"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        success, frames = process(input_file, output_file)
+        elapsed = time.perf_counter() - start
+    if not success:
+        raise RuntimeError(f"Processing {input_file} failed")
+    return elapsed, frames
+
+
+def bench_process_mjpeg(size_mb: int, legacy_mb: int, work_dir: str):
+    """Compares MB/s of the legacy and current _process_mjpeg and checks they agree"""
+    converter = VideoConverter()
+    results = []
+    runs = [('current', converter._process_mjpeg, size_mb)]
+    if legacy_mb:
+        runs.insert(0, ('legacy', legacy_process_mjpeg, legacy_mb))
+        if legacy_mb != size_mb:
+            runs.insert(1, ('current', converter._process_mjpeg, legacy_mb))
+
+    outputs = {}
+    for name, process, mb in runs:
+        input_file = os.path.join(work_dir, f"bench_{mb}mb.mjpeg")
+        if not os.path.exists(input_file):
+            write_intermediate(input_file, mb)
+        output_file = os.path.join(work_dir, f"bench_{name}_{mb}mb.mjpg")
+        elapsed, frames = time_process_mjpeg(process, input_file, output_file)
+        mb_read = os.path.getsize(input_file) / MB
+        results.append((name, mb_read, frames, elapsed, mb_read / elapsed))
+        outputs.setdefault(mb, []).append(output_file)
+
+    for files in outputs.values():
+        if len(files) > 1:
+            with open(files[0], 'rb') as a, open(files[1], 'rb') as b:
+                if a.read() != b.read():
+                    raise RuntimeError("Legacy and current outputs differ")
+        for path in files:
+            os.remove(path)
+
+    print(f"{'implementation':<16}{'input MB':>10}{'frames':>10}{'seconds':>10}{'MB/s':>10}")
+    for name, mb_read, frames, elapsed, rate in results:
+        print(f"{name:<16}{mb_read:>10.0f}{frames:>10}{elapsed:>10.2f}{rate:>10.1f}")
+
+
+def measure(op: Callable[[], int], min_time: float, repeat: int = 3) -> Tuple[float, float]:
+    """Best of repeat rounds of op running for min_time seconds, returns (ops/s, MB/s) from the bytes it reports"""
+    op()    # warm up caches and lazy state
+    best = (0.0, 0.0)
+    for _ in range(repeat):
+        ops = 0
+        processed = 0
+        start = time.perf_counter()
+        while True:
+            processed += op()
+            ops += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        # The fastest round is the one least disturbed by the rest of the machine
+        best = max(best, (ops / elapsed, processed / MB / elapsed))
+    return best
+
+
+def micro_benchmarks(work_dir: str, size_mb: int) -> Dict[str, Callable[[], int]]:
+    """Builds the hot-path operations on a synthetic MJPEG file, each returns the bytes it handled"""
+    intermediate = os.path.join(work_dir, f"suite_{size_mb}mb.mjpeg")
+    movie = os.path.join(work_dir, f"suite_{size_mb}mb.Mjpeg")
+    reframed = os.path.join(work_dir, "suite_reframed.Mjpeg")
+    if not os.path.exists(intermediate):
+        write_intermediate(intermediate, size_mb)
+    converter = VideoConverter()
+    if not os.path.exists(movie):
+        time_process_mjpeg(converter._process_mjpeg, intermediate, movie)
+    movie_size = os.path.getsize(movie)
+    intermediate_size = os.path.getsize(intermediate)
+
+    payload = bytes(1400)
+    packet = RtpPacket()
+    packet.encode(2, 0, 0, 0, 1, 0, 26, 0, payload, 0)
+    datagram = bytes(packet.getPacket())
+
+    def rtp_encode():
+        RtpPacket().encode(2, 0, 0, 0, 1, 1, 26, 0, payload, 90000)
+        return len(payload)
+
+    def rtp_decode():
+        RtpPacket().decode(datagram)
+        return len(datagram)
+
+    def rtp_get_packet():
+        return len(packet.getPacket())
+
+    cached = VideoStream(movie, cache=FrameCache(4 * size_mb * MB))
+    uncached = VideoStream(movie, cache=None)
+    mapped = VideoStream(movie, use_mmap=True)
+    frame = cached.nextFrame()
+    packetizer = RtpJpegPacketizer()
+
+    def packetize():
+        packetizer.packetize(frame, 1, cached.frame_rate)
+        return len(frame)
+
+    def next_frame(stream):
+        def op():
+            data = stream.nextFrame()
+            if data is None:
+                stream.set_frame(0)
+                data = stream.nextFrame()
+            return len(data)
+        return op
+
+    def cache_frame_positions_indexed():
+        uncached.cache_frame_positions()
+        return os.path.getsize(index_path(movie))    # only the sidecar is read
+
+    def cache_frame_positions_scan():
+        os.remove(index_path(movie))
+        uncached.cache_frame_positions()
+        return movie_size
+
+    rng = random.Random(0)
+    total_frames = uncached.get_total_frames()
+
+    def set_frame():
+        uncached.set_frame(rng.randrange(total_frames))
+        return 0
+
+    def process_mjpeg():
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            converter._process_mjpeg(intermediate, reframed)
+        return intermediate_size
+
+    return {
+        'RtpPacket.encode': rtp_encode,
+        'RtpPacket.decode': rtp_decode,
+        'RtpPacket.getPacket': rtp_get_packet,
+        'RtpJpegPacketizer.packetize': packetize,
+        'VideoStream.nextFrame[cached]': next_frame(cached),
+        'VideoStream.nextFrame[uncached]': next_frame(uncached),
+        'VideoStream.nextFrame[mmap]': next_frame(mapped),
+        'VideoStream.cache_frame_positions[index]': cache_frame_positions_indexed,
+        'VideoStream.cache_frame_positions[scan]': cache_frame_positions_scan,
+        'VideoStream.set_frame': set_frame,
+        'VideoConverter._process_mjpeg': process_mjpeg,
+    }
+
+
+def run_suite(work_dir: str, size_mb: int, min_time: float, repeat: int = 3,
+              only: str = None) -> Dict[str, Dict[str, float]]:
+    """Times every hot path, returns {name: {'ops_per_s', 'mb_per_s'}}"""
+    results = {}
+    for name, op in micro_benchmarks(work_dir, size_mb).items():
+        if only and only not in name:
+            continue
+        ops_per_s, mb_per_s = measure(op, min_time, repeat)
+        results[name] = {'ops_per_s': ops_per_s, 'mb_per_s': mb_per_s}
+    return results
+
+
+def compare_to_baseline(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                        tolerance: float) -> int:
+    """Prints the suite against a baseline, returns how many paths regressed beyond tolerance"""
+    regressions = 0
+    print(f"{'benchmark':<42}{'ops/s':>14}{'MB/s':>10}{'baseline':>14}{'change':>9}")
+    for name, result in results.items():
+        line = f"{name:<42}{result['ops_per_s']:>14.0f}{result['mb_per_s']:>10.1f}"
+        reference = baseline.get(name)
+        if reference:
+            change = result['ops_per_s'] / reference['ops_per_s'] - 1
+            line += f"{reference['ops_per_s']:>14.0f}{change * 100:>8.1f}%"
+            if change < -tolerance:
+                line += "  REGRESSION"
+                regressions += 1
+        print(line)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Hot-path benchmarks')
+    parser.add_argument('--suite', action='store_true',
+                        help='run the hot-path micro-benchmark suite instead of the reframing comparison')
+    parser.add_argument('--size-mb', type=int, default=None,
+                        help='size of the synthetic intermediate file (default 2048, 64 with --suite)')
+    parser.add_argument('--legacy-mb', type=int, default=64,
+                        help='size used to time the byte-at-a-time scanner (0 skips it)')
+    parser.add_argument('--work-dir', default=None, help='directory for the synthetic files')
+    parser.add_argument('--min-time', type=float, default=0.5, help='seconds per round of a suite benchmark')
+    parser.add_argument('--repeat', type=int, default=3, help='rounds per suite benchmark, the best one is kept')
+    parser.add_argument('--only', help='run the suite benchmarks whose name contains this text')
+    parser.add_argument('--baseline', help='JSON baseline to compare the suite against')
+    parser.add_argument('--save-baseline', help='write the suite results to this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed ops/s drop against the baseline before failing (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    def run(work_dir):
+        if not args.suite:
+            bench_process_mjpeg(args.size_mb or 2048, args.legacy_mb, work_dir)
+            return 0
+        results = run_suite(work_dir, args.size_mb or 64, args.min_time, args.repeat, args.only)
+        baseline = {}
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if args.save_baseline:
+            with open(args.save_baseline, 'w') as f:
+                json.dump(results, f, indent=1, sort_keys=True)
+        if regressions:
+            print(f"{regressions} benchmark(s) regressed by more than {args.tolerance * 100:.0f}%")
+            return 1
+        return 0
+
+    if args.work_dir:
+        os.makedirs(args.work_dir, exist_ok=True)
+        sys.exit(run(args.work_dir))
+    with tempfile.TemporaryDirectory() as work_dir:
+        sys.exit(run(work_dir))
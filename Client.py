@@ -6,11 +6,23 @@ import socket
 import threading
 import traceback
 import os
+import struct
+import time
+import json
+from io import BytesIO
 
 from RtpPacket import RtpPacket
-
-CACHE_FILE_NAME = "cache-"
-CACHE_FILE_EXT = ".jpg"
+from RtpJpeg import FrameReassembler
+from FrameRenderer import FrameRenderer
+from PlaybackStats import PlaybackStats
+from JitterBuffer import JitterBuffer, DEFAULT_DELAY
+from Thumbnails import parse_thumbnails
+from RtspParser import RtspParser, parseParameters
+
+RTP_RECV_SIZE = 65536
+STATS_OVERLAY_INTERVAL = 500  # ms between overlay refreshes
+FEEDBACK_INTERVAL = 2000  # ms between loss/fps reports that let the server adapt the rendition
+KEEPALIVE_INTERVAL = 20000  # ms between keep-alives while paused, well within the server's session timeout
 
 class Client:
     SETUP_STR = 'SETUP'
@@ -18,6 +30,9 @@ class Client:
     PAUSE_STR = 'PAUSE'
     TEARDOWN_STR = 'TEARDOWN'
     SCRUB_STR = 'SCRUB'
+    SET_PARAMETER_STR = 'SET_PARAMETER'
+    GET_PARAMETER_STR = 'GET_PARAMETER'
+    THUMBNAILS_STR = 'THUMBNAILS'
     INIT = 0
     READY = 1
     PLAYING = 2
@@ -28,11 +43,15 @@ class Client:
     PAUSE = 2
     TEARDOWN = 3
     SCRUB = 4
+    SET_PARAMETER = 5
+    THUMBNAILS = 6
+    GET_PARAMETER = 7
 
     RTSP_VER = "RTSP/1.0"
     TRANSPORT = "RTP/UDP"
 
-    def __init__(self, master, serveraddr, serverport, rtpport, filename):
+    def __init__(self, master, serveraddr, serverport, rtpport, filename, statsOverlay=False, statsFile=None,
+                 jitterDelay=DEFAULT_DELAY):
         self.master = master
         self.master.protocol("WM_DELETE_WINDOW", self.handler)
         self.createWidgets()
@@ -42,7 +61,9 @@ class Client:
         self.fileName = filename
         self.rtspSeq = 0
         self.sessionId = 0
-        self.requestSent = -1
+        self.pending = {}  # CSeq -> request code of the requests awaiting a reply
+        self.feedbackTimer = None
+        self.rendition = None
         self.teardownAcked = 0
         self.scrubbing = False
         self.was_playing = False
@@ -53,6 +74,26 @@ class Client:
         self.expectedFrame = 0
         self.playEvent = None  # Event to control the listener thread
         self.listenerThread = None  # Reference to the listener thread
+        self.stats = PlaybackStats()  # Network, decode and render statistics
+        self.jitterBuffer = None  # Plays frames on a steady clock, None renders frames as they arrive
+        if jitterDelay > 0:
+            self.jitterBuffer = self.stats.buffer = JitterBuffer(self.playFrame, jitterDelay)
+        # Rebuilds frames from RTP fragments, the jitter buffer puts late frames back in order
+        self.reassembler = FrameReassembler(ordered=self.jitterBuffer is None)
+        self.statsFile = statsFile  # Written at TEARDOWN, JSON or CSV by extension
+        self.renderer = FrameRenderer(self.master, self.updateMovie, stats=self.stats)  # Decodes off the Tk thread, newest frame wins
+        self.photo = None
+        self.multicastGroup = None  # (group, port) joined when the server delivers via multicast
+        self.channelGroup = None  # last multicast group joined, kept while paused
+        self.label.bind('<Configure>', lambda e: self.renderer.resize(e.width, e.height))
+        self.thumbnails = None  # (frames per thumbnail, JPEGs) fetched once after SETUP
+        self.thumbnailPhotos = {}  # thumbnail index -> Tk image, built while dragging
+        self.previewLabel = Label(self.main_container, bg="#1A1A1A", fg="#ECF0F1", font=('Helvetica', 9),
+                                  compound=TOP, relief=SOLID, borderwidth=1)
+        self.statsLabel = Label(self.label, bg="#000000", fg="#2ECC71", font=('Courier', 9), justify=LEFT)
+        self.master.bind('<F2>', lambda e: self.toggleStatsOverlay())
+        if statsOverlay:
+            self.toggleStatsOverlay()
 
     def createWidgets(self):
         # Configure style and colors
@@ -152,12 +193,26 @@ class Client:
             width=10
         )
         self.scrubScale.bind("<Button-1>", self.startScrubbing)
+        self.scrubScale.bind("<B1-Motion>", self.previewScrub)
         self.scrubScale.bind("<ButtonRelease-1>", self.handleScrub)
         self.scrubScale.grid(row=0, column=0, sticky='ew')
 
 
 
 
+    def toggleStatsOverlay(self):
+        """Shows or hides the playback statistics over the video"""
+        if self.statsLabel.place_info():
+            self.statsLabel.place_forget()
+        else:
+            self.statsLabel.place(x=8, y=8)
+            self.updateStatsOverlay()
+
+    def updateStatsOverlay(self):
+        if self.statsLabel.place_info():
+            self.statsLabel.configure(text=self.stats.overlayText())
+            self.master.after(STATS_OVERLAY_INTERVAL, self.updateStatsOverlay)
+
     def startScrubbing(self, event):
         if self.state not in [self.READY, self.PLAYING]:
             return
@@ -166,6 +221,46 @@ class Client:
             self.was_playing = True
             self.pauseMovie()
 
+    def thumbnailImage(self, position):
+        """Returns the thumbnail nearest before a scrub position, None without a thumbnail track"""
+        if not self.thumbnails or not self.totalFrames:
+            return None, None
+        step, thumbs = self.thumbnails
+        frame = int((position / 100.0) * self.totalFrames)
+        index = max(0, min(len(thumbs) - 1, frame // step))
+        return index, Image.open(BytesIO(thumbs[index]))
+
+    def previewScrub(self, event):
+        """Shows the thumbnail under the slider while dragging, without asking the server"""
+        if not self.scrubbing:
+            return
+        position = max(0, min(100, self.scrubScale.get()))
+        index, image = self.thumbnailImage(position)
+        if image is None:
+            return
+        photo = self.thumbnailPhotos.get(index)
+        if photo is None:
+            photo = self.thumbnailPhotos[index] = ImageTk.PhotoImage(image)
+        seconds = int(position / 100.0 * self.totalFrames / (self.stats.frameRate or 1))
+        self.previewLabel.configure(image=photo, text=f"{seconds // 60}:{seconds % 60:02d}")
+        self.previewLabel.place(in_=self.scrubScale, relx=position / 100.0, y=0, anchor='s')
+        self.previewLabel.lift()
+
+    def showScrubTarget(self, position):
+        """Fills the video with the upscaled thumbnail of the seek target until its frames arrive"""
+        self.previewLabel.place_forget()
+        _, image = self.thumbnailImage(position)
+        if image is None:
+            # Clear current frame
+            self.label.configure(image='')
+            self.label.image = None
+            self.photo = None
+            return
+        image = image.convert('RGB')
+        self.photo = ImageTk.PhotoImage(image.resize(self.renderer.targetSize(image.size), Image.BILINEAR))
+        self.label.configure(image=self.photo)
+        self.label.image = self.photo
+
     def handleScrub(self, event):
         if self.state not in [self.READY, self.PLAYING]:
             return
@@ -180,9 +275,8 @@ class Client:
             self.expectedFrame = max(0, min(self.totalFrames, 
                                         int((self.scrubValue / 100.0) * self.totalFrames)))
             
-            # Clear current frame
-            self.label.configure(image='')
-            self.label.image = None
+            # Only the final position is sent, dragging was previewed locally
+            self.showScrubTarget(position)
             
             # Reset connection and send scrub request
             self.resetRtpConnection()
@@ -195,15 +289,41 @@ class Client:
     def setupMovie(self):
         if self.state == self.INIT:
             self.sendRtspRequest(self.SETUP)
+            self.sendRtspRequest(self.THUMBNAILS)
 
     def exitClient(self):
         if self.state != self.INIT:
             self.sendRtspRequest(self.TEARDOWN)
+        self.dumpStats()
         self.master.destroy()
         os._exit(0)
 
+    def dumpStats(self):
+        """Prints the playback summary and writes the statistics file, if any"""
+        try:
+            summary = self.stats.dump(self.statsFile) if self.statsFile else self.stats.summary()
+            print("Playback statistics:", json.dumps(summary, indent=1))
+        except Exception as e:
+            print("Error writing playback statistics:", e)
+
+    def scheduleFeedback(self, interval=FEEDBACK_INTERVAL):
+        if self.feedbackTimer is not None:
+            self.master.after_cancel(self.feedbackTimer)
+        self.feedbackTimer = self.master.after(interval, self.sendFeedback)
+
+    def sendFeedback(self):
+        """Reports loss and frame rate while playing and keeps a paused session alive, one report outstanding at a time"""
+        self.feedbackTimer = None
+        if self.state == self.INIT:
+            return
+        if not {self.SET_PARAMETER, self.GET_PARAMETER} & set(self.pending.values()):
+            self.sendRtspRequest(self.SET_PARAMETER if self.state == self.PLAYING else self.GET_PARAMETER)
+        self.scheduleFeedback(FEEDBACK_INTERVAL if self.state == self.PLAYING else KEEPALIVE_INTERVAL)
+
     def pauseMovie(self):
         if self.state == self.PLAYING:
+            if self.jitterBuffer:
+                self.jitterBuffer.pause()  # keep the buffered frames to resume from
             self.sendRtspRequest(self.PAUSE)
 
     def playMovie(self):
@@ -211,7 +331,10 @@ class Client:
             self.playEvent = threading.Event()
             self.playEvent.clear()
             self.listenerThread = threading.Thread(target=self.listenRtp)
+            self.stats.restart()
             self.listenerThread.start()
+            if self.jitterBuffer:
+                self.jitterBuffer.resume()
             self.sendRtspRequest(self.PLAY)
 
     def handleScrub(self, event):
@@ -234,9 +357,8 @@ class Client:
             self.expectedFrame = max(0, min(self.totalFrames, 
                                           int((self.scrubValue / 100.0) * self.totalFrames)))
             
-            # Clear current frame
-            self.label.configure(image='')
-            self.label.image = None
+            # Only the final position is sent, dragging was previewed locally
+            self.showScrubTarget(position)
             
             # Reset connection and send scrub request
             self.resetRtpConnection()
@@ -254,6 +376,8 @@ class Client:
                 self.playEvent.set()
                 if self.listenerThread and self.listenerThread.is_alive():
                     self.listenerThread.join(timeout=1.0)
+            if self.jitterBuffer:
+                self.jitterBuffer.reset()
             
             if hasattr(self, 'rtpSocket'):
                 try:
@@ -271,71 +395,69 @@ class Client:
         if self.state == self.PLAYING and self.totalFrames > 0 and not self.scrubbing:
             try:
                 current_position = min(100, max(0, (self.frameNbr / self.totalFrames) * 100))
-                self.master.after(0, self.scrubScale.set, current_position)
+                self.scrubScale.set(current_position)
             except Exception as e:
                 print("Error updating UI:", e)
 
     def listenRtp(self):
+        # Datagrams are received into one buffer and decoded in place,
+        # the reassembler copies out the fragment data it keeps
+        buffer = bytearray(RTP_RECV_SIZE)
+        view = memoryview(buffer)
+        rtpPacket = RtpPacket()
         while not self.playEvent.is_set():
             try:
-                data = self.rtpSocket.recv(20480)
-                if data:
-                    rtpPacket = RtpPacket()
-                    rtpPacket.decode(data)
-                    currFrameNbr = rtpPacket.seqNum()
-                    
-                    if self.scrubbing:
-                        # During scrubbing, accept the frame if it's close to what we expect
-                        if abs(currFrameNbr - self.expectedFrame) < 10:
-                            self.frameNbr = currFrameNbr
-                            imageFile = self.writeFrame(rtpPacket.getPayload())
-                            self.master.after(0, self.updateMovie, imageFile)
-                            self.scrubbing = False
+                size = self.rtpSocket.recv_into(buffer)
+                if size:
+                    rtpPacket.decode(view[:size])
+                    self.stats.packetReceived(rtpPacket, size)
+                    frame = self.reassembler.addPacket(rtpPacket)
+                    if frame is None:
+                        continue
+                    currFrameNbr, payload = frame
+                    self.stats.frameReceived(currFrameNbr, rtpPacket.timestamp())
+                    if self.jitterBuffer:
+                        self.jitterBuffer.push(currFrameNbr, rtpPacket.timestamp(), payload)
+                        # Fragments of frames already played can be ignored
+                        self.reassembler.expire(self.jitterBuffer.lastReleased)
                     else:
-                        # Normal playback
-                        if currFrameNbr > self.frameNbr:
-                            self.frameNbr = currFrameNbr
-                            imageFile = self.writeFrame(rtpPacket.getPayload())
-                            self.master.after(0, self.updateUI)
-                            self.master.after(0, self.updateMovie, imageFile)
+                        self.playFrame(currFrameNbr, payload)
             except Exception as e:
                 if self.playEvent.is_set():
                     break
                 # print("RTP receive error:", e)
                 continue  # Continue listening even if there was a socket timeout
 
-    def writeFrame(self, data):
-        cachename = CACHE_FILE_NAME + str(self.sessionId) + CACHE_FILE_EXT
-        try:
-            with open(cachename, "wb") as file:
-                file.write(data)
-        except Exception as e:
-            print("Error writing frame to cache:", e)
-        return cachename
-
-    def updateMovie(self, imageFile):
+    def playFrame(self, currFrameNbr, payload):
+        """Hands a frame due for display to the renderer"""
+        if self.scrubbing:
+            # During scrubbing, accept the frame if it's close to what we expect
+            if abs(currFrameNbr - self.expectedFrame) < 10:
+                self.frameNbr = currFrameNbr
+                self.renderer.reset()
+                self.renderer.submit(currFrameNbr, payload)
+                self.scrubbing = False
+        else:
+            # Normal playback
+            if currFrameNbr > self.frameNbr:
+                self.frameNbr = currFrameNbr
+                self.renderer.submit(currFrameNbr, payload)
+
+    def updateMovie(self, frameNbr, image):
+        """Shows a decoded frame, called on the Tk thread by the renderer"""
+        start = time.perf_counter()
         try:
-            # Get the current size of the label
-            label_width = self.label.winfo_width()
-            label_height = self.label.winfo_height()
-            
-            # Open the image and resize it to fit the label while maintaining aspect ratio
-            image = Image.open(imageFile)
-            image_ratio = image.width / image.height
-            label_ratio = label_width / label_height
-            
-            if image_ratio > label_ratio:
-                new_width = label_width
-                new_height = int(label_width / image_ratio)
+            if self.photo is not None and (self.photo.width(), self.photo.height()) == image.size:
+                # Same size as the previous frame, reuse the Tk image
+                self.photo.paste(image)
             else:
-                new_height = label_height
-                new_width = int(label_height * image_ratio)
-            
-            photo = ImageTk.PhotoImage(image.resize((new_width, new_height), Image.LANCZOS))
-            
-            # Update the label with the new image
-            self.label.configure(image=photo)
-            self.label.image = photo
+                self.photo = ImageTk.PhotoImage(image)
+                
+                # Update the label with the new image
+                self.label.configure(image=self.photo)
+                self.label.image = self.photo
+            self.updateUI()
+            self.stats.time('render', frameNbr, time.perf_counter() - start)
         except Exception as e:
             print("Error updating movie frame:", e)
 
@@ -347,34 +469,55 @@ class Client:
             tkMessageBox.showwarning('Connection Failed', f'Connection to \'{self.serverAddr}\' failed.')
 
     def sendRtspRequest(self, requestCode):
+        """Sends a request without waiting for earlier ones, replies are matched by CSeq"""
+        body = ''
         if requestCode == self.SETUP and self.state == self.INIT:
             threading.Thread(target=self.recvRtspReply).start()
             self.rtspSeq += 1
             request = f"{self.SETUP_STR} {self.fileName} {self.RTSP_VER}"
             request += f"\nCSeq: {self.rtspSeq}"
             request += f"\nTransport: {self.TRANSPORT}; client_port= {self.rtpPort}"
-            self.requestSent = self.SETUP
 
         elif requestCode == self.PLAY and self.state == self.READY:
             self.rtspSeq += 1
             request = f"{self.PLAY_STR} {self.fileName} {self.RTSP_VER}"
             request += f"\nCSeq: {self.rtspSeq}"
             request += f"\nSession: {self.sessionId}"
-            self.requestSent = self.PLAY
 
         elif requestCode == self.PAUSE and self.state == self.PLAYING:
             self.rtspSeq += 1
             request = f"{self.PAUSE_STR} {self.fileName} {self.RTSP_VER}"
             request += f"\nCSeq: {self.rtspSeq}"
             request += f"\nSession: {self.sessionId}"
-            self.requestSent = self.PAUSE
 
         elif requestCode == self.TEARDOWN and not self.state == self.INIT:
             self.rtspSeq += 1
             request = f"{self.TEARDOWN_STR} {self.fileName} {self.RTSP_VER}"
             request += f"\nCSeq: {self.rtspSeq}"
             request += f"\nSession: {self.sessionId}"
-            self.requestSent = self.TEARDOWN
+
+        elif requestCode == self.SET_PARAMETER and self.state == self.PLAYING:
+            feedback = self.stats.feedback()
+            body = f"loss: {feedback['loss']:.4f}\nfps: {feedback['fps']:.2f}"
+            self.rtspSeq += 1
+            request = f"{self.SET_PARAMETER_STR} {self.fileName} {self.RTSP_VER}"
+            request += f"\nCSeq: {self.rtspSeq}"
+            request += f"\nSession: {self.sessionId}"
+
+        elif requestCode == self.GET_PARAMETER and self.state == self.READY:
+            # Keep-alive, the server reaps sessions that stay silent while paused
+            self.rtspSeq += 1
+            request = f"{self.GET_PARAMETER_STR} {self.fileName} {self.RTSP_VER}"
+            request += f"\nCSeq: {self.rtspSeq}"
+            request += f"\nSession: {self.sessionId}"
+
+        elif requestCode == self.THUMBNAILS and (self.state == self.READY or self.SETUP in self.pending.values()):
+            # Pipelined behind the SETUP, the server answers it once the session is set up;
+            # the SETUP reply may already have been handled by the reply thread
+            self.rtspSeq += 1
+            request = f"{self.THUMBNAILS_STR} {self.fileName} {self.RTSP_VER}"
+            request += f"\nCSeq: {self.rtspSeq}"
+            request += f"\nSession: {self.sessionId}"
 
         elif requestCode == self.SCRUB:
             self.rtspSeq += 1
@@ -382,20 +525,27 @@ class Client:
             request += f"\nCSeq: {self.rtspSeq}"
             request += f"\nSession: {self.sessionId}"
             request += f"\nPosition: {self.scrubValue}"
-            self.requestSent = self.SCRUB
         else:
             return
 
+        if body:
+            request += f"\nContent-Length: {len(body)}"
+        request += f"\n\n{body}"    #an empty line ends the headers
+        self.pending[self.rtspSeq] = requestCode    #before sending, the reply may come back at once
         self.rtspSocket.send(request.encode('utf-8'))
         print('\nData sent:\n' + request)
 
     def recvRtspReply(self):
+        parser = RtspParser()    #replies may be split across reads or arrive several at once
         while True:
             try:
-                reply = self.rtspSocket.recv(1024)
-                if reply:
-                    self.parseRtspReply(reply.decode("utf-8"))
-                if self.requestSent == self.TEARDOWN:
+                data = self.rtspSocket.recv(RTP_RECV_SIZE)
+                if not data:
+                    print("RTSP connection closed by the server")
+                    break
+                for reply in parser.feed(data):
+                    self.parseRtspReply(reply)
+                if self.teardownAcked:
                     self.rtspSocket.shutdown(socket.SHUT_RDWR)
                     self.rtspSocket.close()
                     break
@@ -403,46 +553,78 @@ class Client:
                 print("Error receiving RTSP reply:", e)
                 break
 
-    def parseRtspReply(self, data):
-        lines = data.split('\n')
-        seqNum = int(lines[1].split(' ')[1])
-        
-        if seqNum == self.rtspSeq:
-            session = int(lines[2].split(' ')[1])
-            if self.sessionId == 0:
-                self.sessionId = session
-                
-            if self.sessionId == session:
-                if int(lines[0].split(' ')[1]) == 200:
-                    if self.requestSent == self.SETUP:
-                        self.state = self.READY
-                        self.openRtpPort()
-                        for line in lines:
-                            if line.startswith('TotalFrames'):
-                                self.totalFrames = int(line.split(':')[1])
-                                print(f"Total Frames set to: {self.totalFrames}")
-                    elif self.requestSent == self.PLAY:
-                        self.state = self.PLAYING
-                    elif self.requestSent == self.PAUSE:
+    def parseRtspReply(self, reply):
+        """Applies a reply (an RtspMessage) to the request with the same CSeq"""
+        requestCode = self.pending.pop(reply.cseq, None)
+        if requestCode is None:
+            return    # not a request of ours
+
+        rendition = reply.header('Rendition')
+        if rendition and rendition != self.rendition:
+            self.rendition = rendition
+            print(f"Server rendition: {self.rendition}")
+        session = int(reply.header('Session', '0').split(';')[0])
+        if self.sessionId == 0:
+            self.sessionId = session
+
+        if self.sessionId == session:
+            if reply.statusCode == 200:
+                if requestCode == self.SETUP:
+                    self.state = self.READY
+                    self.openRtpPort()
+                    if reply.header('TotalFrames'):
+                        self.totalFrames = int(reply.header('TotalFrames'))
+                        print(f"Total Frames set to: {self.totalFrames}")
+                    if reply.header('FrameRate'):
+                        self.stats.frameRate = float(reply.header('FrameRate'))
+                    self.scheduleFeedback(KEEPALIVE_INTERVAL)
+                elif requestCode == self.THUMBNAILS:
+                    self.thumbnails = parse_thumbnails(reply.body) if reply.body else None
+                    if self.thumbnails:
+                        print(f"Scrub previews: {len(self.thumbnails[1])} thumbnails")
+                elif requestCode == self.PLAY:
+                    self.state = self.PLAYING
+                    self.scheduleFeedback()
+                    transport = reply.header('Transport', '')
+                    if 'multicast' in transport:
+                        params = parseParameters(transport)
+                        self.openMulticastPort(params['destination'], int(params['port']))
+                elif requestCode == self.PAUSE:
+                    self.state = self.READY
+                    self.scheduleFeedback(KEEPALIVE_INTERVAL)
+                    if self.playEvent:
+                        self.playEvent.set()
+                    if self.multicastGroup:
+                        self.leaveMulticast()
+                elif requestCode == self.TEARDOWN:
+                    self.state = self.INIT
+                    self.teardownAcked = 1
+                    if self.jitterBuffer:
+                        self.jitterBuffer.close()
+                    if self.playEvent:
+                        self.playEvent.set()
+                        if self.listenerThread:
+                            self.listenerThread.join()
+                elif requestCode == self.SCRUB:
+                    self.frameNbr = self.expectedFrame
+                    if self.was_playing:
+                        self.playMovie()
+                    else:
                         self.state = self.READY
-                        if self.playEvent:
-                            self.playEvent.set()
-                    elif self.requestSent == self.TEARDOWN:
-                        self.state = self.INIT
-                        self.teardownAcked = 1
-                        if self.playEvent:
-                            self.playEvent.set()
-                            if self.listenerThread:
-                                self.listenerThread.join()
-                    elif self.requestSent == self.SCRUB:
-                        self.frameNbr = self.expectedFrame
-                        if self.was_playing:
-                            self.playMovie()
-                        else:
-                            self.state = self.READY
-                            self.scrubbing = False
+                        self.scrubbing = False
+            elif reply.statusCode == 503:
+                # Over the server's capacity, nothing changed on its side
+                if requestCode == self.PLAY and self.playEvent:
+                    self.playEvent.set()
+                self.master.after(0, lambda: tkMessageBox.showwarning(
+                    'Server Busy', 'The server is at capacity, please try again later.'))
+            elif requestCode == self.PLAY and self.playEvent:
+                # Refused, e.g. 455 in the wrong state, stop the listener started for it
+                self.playEvent.set()
 
     def openRtpPort(self):
+        self.reassembler.reset()
+        self.multicastGroup = None
         self.rtpSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.rtpSocket.settimeout(0.5)
         try:
@@ -451,6 +633,40 @@ class Client:
         except:
             tkMessageBox.showwarning('Unable to Bind', f'Unable to bind PORT={self.rtpPort}')
 
+    def openMulticastPort(self, group, port):
+        """Listens on a multicast group the server sends this session's channel to"""
+        if self.multicastGroup == (group, port):
+            return
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.settimeout(0.5)
+        try:
+            sock.bind(('', port))
+            # Join on the interface that reaches the server
+            interface = self.rtspSocket.getsockname()[0]
+            mreq = struct.pack('4s4s', socket.inet_aton(group), socket.inet_aton(interface))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        except Exception as e:
+            sock.close()
+            print("Unable to join multicast group:", e)
+            return
+        old, self.rtpSocket = self.rtpSocket, sock
+        old.close()
+        self.reassembler.reset()
+        self.stats.restart()  # the channel has its own sequence numbers
+        if (group, port) != self.channelGroup:
+            # Another channel may be behind the frames already played, start over from its frames
+            if self.jitterBuffer:
+                self.jitterBuffer.reset()
+            self.frameNbr = 0
+        self.multicastGroup = self.channelGroup = (group, port)
+
+    def leaveMulticast(self):
+        """Leaves the multicast group while paused and listens for unicast again, the kernel would keep queueing the channel's datagrams"""
+        old = self.rtpSocket
+        self.openRtpPort()
+        old.close()
+
     def handler(self):
         self.pauseMovie()
         if tkMessageBox.askokcancel("Quit?", "Are you sure you want to quit?"):
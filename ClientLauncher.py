@@ -1,20 +1,25 @@
 import sys
+import argparse
 from tkinter import Tk
 from Client import Client
 
 if __name__ == "__main__":
-	try:
-		serverAddr = sys.argv[1]      #address on which server is running
-		serverPort = sys.argv[2]      #rtsp socket port
-		rtpPort = sys.argv[3]         #rtp port
-		fileName = sys.argv[4]	      #which file we wnat to stream or get from server
-	except:
-		print("[Usage: ClientLauncher.py Server_name Server_port RTP_port Video_file]\n")	
+	parser = argparse.ArgumentParser(usage='ClientLauncher.py Server_name Server_port RTP_port Video_file [options]')
+	parser.add_argument('serverAddr', help='address on which server is running')
+	parser.add_argument('serverPort', help='rtsp socket port')
+	parser.add_argument('rtpPort', help='rtp port')
+	parser.add_argument('fileName', help='which file we want to stream or get from server')
+	parser.add_argument('--stats', action='store_true', help='show playback statistics over the video (toggle with F2)')
+	parser.add_argument('--stats-file', help='write playback statistics at TEARDOWN (.json or .csv)')
+	parser.add_argument('--jitter-ms', type=float, default=200,
+						help='playout buffer absorbing network jitter, 0 shows frames as they arrive')
+	args = parser.parse_args()
 	
 	root = Tk()     #create GUI using tkinter library
 	
 	# Create a new client
-	app = Client(root, serverAddr, serverPort, rtpPort, fileName)   #client class
+	app = Client(root, args.serverAddr, args.serverPort, args.rtpPort, args.fileName,
+				 statsOverlay=args.stats, statsFile=args.stats_file, jitterDelay=args.jitter_ms / 1000)   #client class
 	app.master.title("RTPClient")	
 	root.mainloop()
-	sys.exit()
\ No newline at end of file
+	sys.exit()
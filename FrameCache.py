@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+
+
+class FrameCache:
+    """Size-bounded LRU cache of frame data shared by every VideoStream.
+
+    Keys are (file, frame index) pairs so sessions streaming the same file
+    read each frame from disk only once while it stays cached.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return cached frame data or None, marking it most recently used."""
+        with self.lock:
+            data = self.frames.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        """Cache frame data, evicting least recently used frames to stay in budget."""
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.frames.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.frames[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.frames.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def resize(self, max_bytes):
+        """Change the budget, evicting frames if it shrank."""
+        with self.lock:
+            self.max_bytes = max_bytes
+            while self.size > self.max_bytes:
+                _, evicted = self.frames.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+            self.size = 0
+
+    def stats(self):
+        """Return counters used to size the cache."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'frames': len(self.frames),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Process-wide cache consulted by VideoStream
+shared_cache = FrameCache()
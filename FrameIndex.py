@@ -0,0 +1,158 @@
+import os
+import sys
+import argparse
+import struct
+from array import array
+from typing import Optional, Tuple
+
+# Sidecar layout: header followed by the frame positions as little-endian uint64
+#   magic, version, source file size, source mtime (ns), number of positions,
+#   frame rate (0 if unknown)
+INDEX_HEADER = struct.Struct('<4sH2xQqQd')
+INDEX_MAGIC = b'FIDX'
+INDEX_VERSION = 2
+INDEX_EXT = '.idx'
+MJPEG_EXTS = ('.mjpeg', '.mjpg')
+
+
+def index_path(video_file: str) -> str:
+    """Returns the sidecar path for a video file"""
+    return video_file + INDEX_EXT
+
+
+def scan_frame_positions(file) -> array:
+    """Walks the 5-byte size headers of an open MJPEG file and returns frame positions"""
+    positions = array('Q', [0])
+    file.seek(0)
+
+    while True:
+        try:
+            # Read 5-byte ASCII size header
+            size_str = file.read(5)
+            if not size_str or len(size_str) != 5:
+                break
+
+            frame_size = int(size_str.decode('ascii'))
+            current_pos = file.tell()
+            positions.append(current_pos + frame_size)
+            file.seek(frame_size, 1)
+
+        except Exception:
+            break
+
+    file.seek(0)
+    return positions
+
+
+def read_frame_rate(video_file: str) -> float:
+    """Returns the frame rate recorded in a sidecar even if it is stale, 0.0 if none"""
+    try:
+        with open(index_path(video_file), 'rb') as f:
+            header = f.read(INDEX_HEADER.size)
+        magic, version, _, _, _, frame_rate = INDEX_HEADER.unpack(header)
+    except (OSError, struct.error):
+        return 0.0
+    return frame_rate if magic == INDEX_MAGIC and version == INDEX_VERSION else 0.0
+
+
+def load_index(video_file: str, stat: Optional[os.stat_result] = None) -> Optional[Tuple[array, float]]:
+    """
+    Loads the sidecar if it matches the video's size and mtime
+    Returns: (frame positions, frame rate or 0.0 if unknown), None if there is no valid index
+    """
+    if stat is None:
+        stat = os.stat(video_file)
+    try:
+        with open(index_path(video_file), 'rb') as f:
+            data = f.read()
+        magic, version, size, mtime_ns, count, frame_rate = INDEX_HEADER.unpack_from(data)
+    except (OSError, struct.error):
+        return None
+
+    if (magic != INDEX_MAGIC or version != INDEX_VERSION or size != stat.st_size
+            or mtime_ns != stat.st_mtime_ns or len(data) != INDEX_HEADER.size + 8 * count):
+        return None
+
+    positions = array('Q')
+    positions.frombytes(memoryview(data)[INDEX_HEADER.size:])
+    if sys.byteorder == 'big':
+        positions.byteswap()
+    return positions, frame_rate
+
+
+def save_index(video_file: str, positions: array, stat: Optional[os.stat_result] = None,
+               frame_rate: float = 0.0) -> bool:
+    """Writes the sidecar atomically, returns False if it could not be written"""
+    if stat is None:
+        stat = os.stat(video_file)
+    data = array('Q', positions)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    path = index_path(video_file)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, stat.st_size,
+                                      stat.st_mtime_ns, len(data), frame_rate))
+            f.write(data.tobytes())
+        os.replace(temp_path, path)
+        return True
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+
+
+def build_index(video_file: str, force: bool = False, frame_rate: Optional[float] = None) -> Optional[int]:
+    """
+    Builds the sidecar for one video, keeping a previously recorded frame rate unless one is given
+    Returns: its frame count, or None if the index was already current
+    """
+    stat = os.stat(video_file)
+    index = load_index(video_file, stat)
+    if not force and index is not None and frame_rate is None:
+        return None
+    if frame_rate is None:
+        frame_rate = index[1] if index else read_frame_rate(video_file)
+    with open(video_file, 'rb') as f:
+        positions = scan_frame_positions(f)
+    if not save_index(video_file, positions, stat, frame_rate):
+        raise OSError(f"Unable to write {index_path(video_file)}")
+    return len(positions) - 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Pre-build frame index sidecars for MJPEG files')
+    parser.add_argument('paths', nargs='+', help='media directories or MJPEG files')
+    parser.add_argument('-f', '--force', action='store_true', help='rebuild indexes that are already current')
+    parser.add_argument('-r', '--frame-rate', type=float,
+                        help='frame rate to record for the videos (default: keep the recorded one)')
+    args = parser.parse_args()
+
+    videos = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.extend(os.path.join(root, name) for name in sorted(files)
+                              if name.lower().endswith(MJPEG_EXTS))
+        else:
+            videos.append(path)
+
+    built = current = failed = 0
+    for video in videos:
+        try:
+            frames = build_index(video, args.force, args.frame_rate)
+        except OSError as e:
+            print(f"Failed: {video}: {e}")
+            failed += 1
+            continue
+        if frames is None:
+            current += 1
+        else:
+            built += 1
+            print(f"Indexed {video}: {frames} frames")
+
+    print(f"Built {built}, already current {current}, failed {failed}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,118 @@
+import threading
+import time
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+DECODE_WORKERS = 2
+
+
+class FrameRenderer:
+    """Decodes and scales frames off the Tk thread, keeping only the newest one.
+
+    submit() can be called for every received frame: frames that arrive while
+    the decoders are busy replace each other, and decoded images wait in a
+    single slot that the Tk thread drains through one pending after() call,
+    so a slow UI drops stale frames instead of queueing them.
+    """
+
+    def __init__(self, master, show, workers=DECODE_WORKERS, stats=None):
+        self.master = master
+        self.show = show    #called on the Tk thread with (frame number, image)
+        self.stats = stats  #PlaybackStats receiving decode and resize times
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.pending = None         #newest (frame number, payload) waiting for a decoder
+        self.decoding = 0           #decoders currently running
+        self.latest = None          #newest decoded (frame number, image) waiting for Tk
+        self.renderScheduled = False
+        self.displayedFrame = 0
+        self.displaySize = (1, 1)
+        self.targets = {}           #source size -> display size, cleared on resize
+
+    def resize(self, width, height):
+        """Update the display size, called from the label's <Configure> event."""
+        size = (max(1, width), max(1, height))
+        if size != self.displaySize:
+            self.displaySize = size
+            self.targets = {}
+
+    def reset(self):
+        """Drop queued frames and accept any frame number, e.g. after a seek."""
+        with self.lock:
+            self.pending = None
+            self.latest = None
+            self.displayedFrame = 0
+
+    def submit(self, frameNbr, payload):
+        """Queue a received frame, replacing any frame not yet being decoded."""
+        with self.lock:
+            self.pending = (frameNbr, payload)
+            if self.decoding >= self.workers:
+                return
+            self.decoding += 1
+        self.pool.submit(self.decodeLoop)
+
+    def targetSize(self, size):
+        """Return the size that fits the display while keeping the aspect ratio."""
+        target = self.targets.get(size)
+        if target is None:
+            label_width, label_height = self.displaySize
+            image_ratio = size[0] / size[1]
+            if image_ratio > label_width / label_height:
+                target = (label_width, max(1, int(label_width / image_ratio)))
+            else:
+                target = (max(1, int(label_height * image_ratio)), label_height)
+            self.targets[size] = target
+        return target
+
+    def decode(self, frameNbr, payload):
+        start = time.perf_counter()
+        image = Image.open(BytesIO(payload))
+        target = self.targetSize(image.size)
+        # Let the JPEG decoder scale down by 1/2, 1/4 or 1/8 during the DCT
+        image.draft('RGB', target)
+        image.load()
+        decoded = time.perf_counter()
+        if image.size != target:
+            image = image.resize(target, Image.BILINEAR)
+        if self.stats:
+            self.stats.time('decode', frameNbr, decoded - start)
+            self.stats.time('resize', frameNbr, time.perf_counter() - decoded)
+        return image
+
+    def decodeLoop(self):
+        while True:
+            with self.lock:
+                if self.pending is None:
+                    self.decoding -= 1
+                    return
+                frameNbr, payload = self.pending
+                self.pending = None
+
+            try:
+                image = self.decode(frameNbr, payload)
+            except Exception as e:
+                print("Error decoding movie frame:", e)
+                continue
+
+            with self.lock:
+                if self.latest is not None and self.latest[0] > frameNbr:
+                    continue
+                self.latest = (frameNbr, image)
+                if self.renderScheduled:
+                    continue
+                self.renderScheduled = True
+            self.master.after(0, self.render)
+
+    def render(self):
+        """Show the newest decoded frame, runs on the Tk thread."""
+        with self.lock:
+            latest, self.latest = self.latest, None
+            self.renderScheduled = False
+            if latest is None or latest[0] < self.displayedFrame:
+                return
+            self.displayedFrame = latest[0]
+        self.show(*latest)
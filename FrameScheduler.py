@@ -0,0 +1,103 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PacedStream:
+    """A stream registered with the scheduler, woken once per frame interval."""
+
+    def __init__(self, callback, interval, deadline):
+        self.callback = callback    #called with the frames skipped since the last call and how late it runs
+        self.interval = interval
+        self.deadline = deadline
+        self.cancelled = False
+        self.skipped = 0
+        self.thread = None          #thread running the callback, if any
+        self.idle = threading.Event()
+        self.idle.set()
+
+    def cancel(self, wait=True):
+        """Stop waking this stream; optionally wait for a running callback to return."""
+        self.cancelled = True
+        if wait and self.thread is not threading.current_thread():
+            self.idle.wait()
+
+
+class FrameScheduler:
+    """Monotonic-clock scheduler that paces every playing stream from a few threads.
+
+    Deadlines advance on a fixed grid from the start time, so pacing does not
+    drift with read/send time. A stream that falls behind, or whose previous
+    frame is still being sent, skips the frames it missed instead of sending
+    them in a burst.
+    """
+
+    THREAD_PREFIX = 'FrameScheduler'
+
+    def __init__(self, workers=4):
+        self.heap = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=self.THREAD_PREFIX)
+        self.thread = None
+
+    def add(self, callback, interval, delay=None):
+        """Call callback every interval seconds, first after delay (default one interval)."""
+        stream = PacedStream(callback, interval,
+                             time.monotonic() + (interval if delay is None else delay))
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=self.THREAD_PREFIX + '-timer',
+                                               daemon=True)
+                self.thread.start()
+            self._push(stream)
+        return stream
+
+    def _push(self, stream):
+        heapq.heappush(self.heap, (stream.deadline, next(self.counter), stream))
+        self.condition.notify()
+
+    def _run(self):
+        with self.condition:
+            while True:
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                deadline, _, stream = self.heap[0]
+                if stream.cancelled:
+                    heapq.heappop(self.heap)
+                    continue
+                now = time.monotonic()
+                if deadline > now:
+                    self.condition.wait(deadline - now)
+                    continue
+                heapq.heappop(self.heap)
+
+                # Frames whose deadlines already passed are skipped, not bunched
+                missed = int((now - deadline) // stream.interval)
+                stream.deadline = deadline + (missed + 1) * stream.interval
+                if stream.idle.is_set():
+                    stream.idle.clear()
+                    skipped, stream.skipped = stream.skipped + missed, 0
+                    self.pool.submit(self._call, stream, skipped, deadline)
+                else:
+                    stream.skipped += missed + 1    #previous frame still being sent
+                self._push(stream)
+
+    def _call(self, stream, skipped, deadline):
+        stream.thread = threading.current_thread()
+        try:
+            if not stream.cancelled:
+                # Lateness includes waiting for a free worker, the sign of an overloaded pool
+                stream.callback(skipped, time.monotonic() - deadline)
+        except Exception as e:
+            print("Frame scheduler callback error:", e)
+        finally:
+            stream.thread = None
+            stream.idle.set()
+
+
+# Process-wide scheduler used by ServerWorker
+shared_scheduler = FrameScheduler()
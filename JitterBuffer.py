@@ -0,0 +1,130 @@
+import heapq
+import threading
+import time
+
+from RtpPacket import RTP_CLOCK_RATE
+
+DEFAULT_DELAY = 0.2     #seconds of frames held before playout starts
+MAX_FRAMES = 256        #frames held at most, the oldest is released early beyond that
+
+
+class JitterBuffer:
+    """Playout buffer releasing frames on a steady local clock.
+
+    Frames are held by frame number, so frames that arrive late or out of
+    order still play in order, and each one is released when the local
+    clock reaches its RTP timestamp plus the buffer delay. The clock is
+    anchored on the first frame of a run and moved along with every release,
+    so missing frames leave a gap instead of shifting the frames after them.
+    Frames arriving after the buffer ran dry restart the clock with a fresh
+    delay. While paused, frames are kept and playout resumes from them at
+    once.
+    """
+
+    def __init__(self, release, delay=DEFAULT_DELAY, maxFrames=MAX_FRAMES):
+        self.release = release    #called with (frame number, payload) on the playout thread
+        self.delay = delay
+        self.maxFrames = maxFrames
+        self.cond = threading.Condition()
+        self.heap = []            #frame numbers waiting for playout
+        self.frames = {}          #frame number -> (RTP timestamp, payload)
+        self.anchor = None        #(RTP timestamp, local time it plays at)
+        self.lastReleased = -1
+        self.paused = False
+        self.closed = False
+        self.underruns = 0
+        self.lateFrames = 0       #arrived after a later frame was already played
+        threading.Thread(target=self.playout, name='JitterBuffer', daemon=True).start()
+
+    def due(self, timestamp):
+        """Local time a frame plays at, from its RTP timestamp relative to the anchor."""
+        anchorTimestamp, anchorTime = self.anchor
+        delta = ((timestamp - anchorTimestamp + 0x80000000) & 0xFFFFFFFF) - 0x80000000    #timestamps wrap
+        return anchorTime + delta / RTP_CLOCK_RATE
+
+    def push(self, frameNbr, timestamp, payload):
+        """Add a reassembled frame, called from the RTP listener."""
+        with self.cond:
+            if frameNbr <= self.lastReleased:
+                self.lateFrames += 1
+                return
+            if frameNbr in self.frames:
+                return
+            now = time.monotonic()
+            if self.anchor is None:
+                self.anchor = (timestamp, now + self.delay)
+            elif not self.frames and not self.paused and self.due(timestamp) < now:
+                # Ran dry: rebuffer instead of playing every later frame the moment it arrives
+                self.underruns += 1
+                self.anchor = (timestamp, now + self.delay)
+            self.frames[frameNbr] = (timestamp, payload)
+            heapq.heappush(self.heap, frameNbr)
+            self.cond.notify()
+
+    def playout(self):
+        while True:
+            with self.cond:
+                while True:
+                    if self.closed:
+                        return
+                    if self.heap and not self.paused:
+                        frameNbr = self.heap[0]
+                        timestamp, payload = self.frames[frameNbr]
+                        due = self.due(timestamp)
+                        wait = due - time.monotonic()
+                        if wait <= 0 or len(self.heap) > self.maxFrames:
+                            break
+                        self.cond.wait(wait)
+                    else:
+                        self.cond.wait()
+                heapq.heappop(self.heap)
+                del self.frames[frameNbr]
+                self.lastReleased = frameNbr
+                self.anchor = (timestamp, due)
+            try:
+                self.release(frameNbr, payload)
+            except Exception as e:
+                print("Error releasing frame:", e)
+
+    def pause(self):
+        """Stop releasing frames but keep the ones already buffered."""
+        with self.cond:
+            self.paused = True
+
+    def resume(self):
+        """Continue playout, starting at once with the earliest buffered frame."""
+        with self.cond:
+            self.paused = False
+            if self.heap:
+                self.anchor = (self.frames[self.heap[0]][0], time.monotonic())
+            else:
+                self.anchor = None
+            self.cond.notify()
+
+    def reset(self):
+        """Drop every buffered frame and accept any frame number, e.g. after a seek."""
+        with self.cond:
+            self.heap.clear()
+            self.frames.clear()
+            self.anchor = None
+            self.lastReleased = -1
+            self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+    def depth(self):
+        """Return the buffered frames and the seconds of playout they cover."""
+        with self.cond:
+            if not self.heap:
+                return 0, 0.0
+            timestamps = [timestamp for timestamp, _ in self.frames.values()]
+            span = (max(timestamps) - min(timestamps)) & 0xFFFFFFFF
+            return len(self.heap), span / RTP_CLOCK_RATE
+
+    def stats(self):
+        frames, seconds = self.depth()
+        return {'buffer_frames': frames, 'buffer_ms': seconds * 1000,
+                'buffer_underruns': self.underruns, 'buffer_late_frames': self.lateFrames}
@@ -0,0 +1,320 @@
+import sys
+import time
+import socket
+import struct
+import json
+import asyncio
+import argparse
+import statistics
+
+from RtpPacket import RtpPacket
+from RtpJpeg import FrameReassembler
+from RtspParser import RtspParser, parseParameters
+
+
+class RtpReceiver(asyncio.DatagramProtocol):
+    """Counts RTP traffic for one simulated session."""
+
+    def __init__(self, session):
+        self.session = session
+
+    def datagram_received(self, data, addr):
+        self.session.packetReceived(data)
+
+
+class LoadSession:
+    """One headless viewer speaking the same RTSP dialect as Client."""
+
+    RTSP_VER = "RTSP/1.0"
+    TRANSPORT = "RTP/UDP"
+
+    def __init__(self, index, host, port, rtpPort, fileName):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.rtpPort = rtpPort
+        self.fileName = fileName
+        self.rtspSeq = 0
+        self.sessionId = 0
+        self.reader = None
+        self.writer = None
+        self.parser = RtspParser()
+        self.replies = {}    #CSeq -> reply received before it was awaited
+        self.transport = None
+        self.multicastTransport = None    #receives the channel when the server delivers via multicast
+        self.multicastGroup = None
+        self.reassembler = FrameReassembler()
+        self.rtpPacket = RtpPacket()    #decoded in place for every datagram
+
+        self.frames = 0
+        self.bytes = 0
+        self.packets = 0
+        self.lost = 0
+        self.firstSeq = None
+        self.highestSeq = None
+        self.playTime = 0.0
+        self.playStarted = None
+        self.setupLatency = None
+        self.scrubLatencies = []
+        self.scrubStarted = None
+        self.scrubTarget = None
+        self.error = None
+
+    def packetReceived(self, data):
+        self.packets += 1
+        self.bytes += len(data)
+        rtpPacket = self.rtpPacket
+        rtpPacket.decode(data)
+
+        # Extended sequence numbers so gaps survive 16-bit wrap-around
+        seq = rtpPacket.seqNum()
+        if self.highestSeq is None:
+            self.firstSeq = self.highestSeq = seq
+        else:
+            delta = (seq - (self.highestSeq & 0xFFFF)) & 0xFFFF
+            if delta < 0x8000:
+                self.highestSeq += delta
+
+        frame = self.reassembler.addPacket(rtpPacket)
+        if frame is None:
+            return
+        self.frames += 1
+        if self.scrubStarted is not None and abs(frame[0] - self.scrubTarget) < 10:
+            self.scrubLatencies.append(time.perf_counter() - self.scrubStarted)
+            self.scrubStarted = None
+
+    def closeSeqRun(self):
+        """Account losses for the packets expected since the last PLAY."""
+        if self.highestSeq is not None:
+            expected = self.highestSeq - self.firstSeq + 1
+            self.lost += max(0, expected - self.runPackets)
+        self.firstSeq = self.highestSeq = None
+
+    def send(self, method, extra=''):
+        """Write a request without waiting for its reply, returns its CSeq."""
+        self.rtspSeq += 1
+        request = f"{method} {self.fileName} {self.RTSP_VER}\nCSeq: {self.rtspSeq}"
+        if method == 'SETUP':
+            request += f"\nTransport: {self.TRANSPORT}; client_port= {self.rtpPort}"
+        else:
+            request += f"\nSession: {self.sessionId}"
+        request += extra + "\n\n"
+        self.writer.write(request.encode('utf-8'))
+        return self.rtspSeq
+
+    async def reply(self, method, cseq):
+        """Wait for the reply to request cseq, keeping replies to other pipelined requests."""
+        while cseq not in self.replies:
+            data = await self.reader.read(65536)
+            if not data:
+                raise IOError(f"{method} failed: connection closed")
+            for message in self.parser.feed(data):
+                self.replies[message.cseq] = message
+        reply = self.replies.pop(cseq)
+        if reply.statusCode != 200:
+            raise IOError(f"{method} failed: {reply.startLine!r}")
+        return reply
+
+    async def request(self, method, extra=''):
+        cseq = self.send(method, extra)
+        await self.writer.drain()
+        return await self.reply(method, cseq)
+
+    async def play(self):
+        self.runPackets = self.packets
+        self.playStarted = time.perf_counter()
+        reply = await self.request('PLAY')
+        transport = reply.header('Transport', '')
+        if 'multicast' in transport:
+            params = parseParameters(transport)
+            await self.joinMulticast(params['destination'], int(params['port']))
+
+    async def joinMulticast(self, group, port):
+        """Listen on the multicast group the server sends this session's channel to, as Client does."""
+        if self.multicastGroup == (group, port):
+            return
+        self.leaveMulticast()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)    #sessions of this process share the port
+        try:
+            sock.bind(('', port))
+            # Join on the interface that reaches the server
+            interface = self.writer.get_extra_info('sockname')[0]
+            mreq = struct.pack('4s4s', socket.inet_aton(group), socket.inet_aton(interface))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        except OSError:
+            sock.close()
+            raise
+        loop = asyncio.get_running_loop()
+        self.multicastTransport, _ = await loop.create_datagram_endpoint(lambda: RtpReceiver(self), sock=sock)
+        self.multicastGroup = (group, port)
+        self.reassembler.reset()    #the channel numbers frames from its own position
+
+    def leaveMulticast(self):
+        if self.multicastTransport:
+            self.multicastTransport.close()
+        self.multicastTransport = self.multicastGroup = None
+
+    async def pause(self):
+        await self.request('PAUSE')
+        self.leaveMulticast()    #the kernel would keep queueing the channel while paused
+        self.playTime += time.perf_counter() - self.playStarted
+        self.playStarted = None
+        self.runPackets = self.packets - self.runPackets
+        self.closeSeqRun()
+
+    async def run(self, duration, scrubEvery):
+        loop = asyncio.get_running_loop()
+        try:
+            self.transport, _ = await loop.create_datagram_endpoint(
+                lambda: RtpReceiver(self), local_addr=('0.0.0.0', self.rtpPort))
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+            start = time.perf_counter()
+            reply = await self.request('SETUP')
+            self.setupLatency = time.perf_counter() - start
+            self.sessionId = int(reply.header('Session', '0').split(';')[0])
+            totalFrames = int(reply.header('TotalFrames', 0))
+
+            await self.play()
+            end = time.perf_counter() + duration
+            scrubs = 0
+            while time.perf_counter() < end:
+                wait = min(scrubEvery or duration, end - time.perf_counter())
+                await asyncio.sleep(max(0, wait))
+                if scrubEvery and time.perf_counter() < end and totalFrames:
+                    # Seek to a different position and time the first frame from there
+                    scrubs += 1
+                    position = (scrubs * 37) % 100
+                    await self.pause()
+                    self.reassembler.reset()
+                    self.scrubTarget = int(position / 100.0 * totalFrames)
+                    self.scrubStarted = time.perf_counter()
+                    # The PLAY is pipelined behind the SCRUB, saving a round trip
+                    scrubSeq = self.send('SCRUB', f"\nPosition: {position}")
+                    await self.play()
+                    await self.reply('SCRUB', scrubSeq)
+
+            await self.pause()
+            await self.request('TEARDOWN')
+            if not self.frames:
+                raise IOError("no frames received")
+        except Exception as e:
+            self.error = str(e)
+            if self.playStarted is not None:
+                self.playTime += time.perf_counter() - self.playStarted
+        finally:
+            if self.writer:
+                self.writer.close()
+            if self.transport:
+                self.transport.close()
+            self.leaveMulticast()
+
+    def stats(self):
+        fps = self.frames / self.playTime if self.playTime else 0.0
+        expected = self.packets + self.lost
+        return {
+            'session': self.index,
+            'frames': self.frames,
+            'fps': fps,
+            'bytes_per_s': self.bytes / self.playTime if self.playTime else 0.0,
+            'packets': self.packets,
+            'lost_packets': self.lost,
+            'loss': self.lost / expected if expected else 0.0,
+            'frames_dropped': self.reassembler.framesDropped,
+            'setup_latency': self.setupLatency,
+            'scrub_latencies': self.scrubLatencies,
+            'error': self.error,
+        }
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+
+def summarize(results, elapsed):
+    ok = [r for r in results if not r['error']]
+    rejected = [r for r in results if r['error'] and ' 503 ' in r['error']]    #turned away by admission control
+    setups = [r['setup_latency'] for r in results if r['setup_latency'] is not None]
+    scrubs = [latency for r in results for latency in r['scrub_latencies']]
+    packets = sum(r['packets'] for r in results)
+    lost = sum(r['lost_packets'] for r in results)
+    return {
+        'sessions': len(results),
+        'failed': len(results) - len(ok) - len(rejected),
+        'rejected': len(rejected),
+        'elapsed': elapsed,
+        'frames': sum(r['frames'] for r in results),
+        'aggregate_fps': sum(r['fps'] for r in results),
+        'mean_session_fps': statistics.mean(r['fps'] for r in ok) if ok else 0.0,
+        'min_session_fps': min((r['fps'] for r in ok), default=0.0),
+        'aggregate_bytes_per_s': sum(r['bytes_per_s'] for r in results),
+        'loss': lost / (packets + lost) if packets + lost else 0.0,
+        'setup_latency_p50': percentile(setups, 50),
+        'setup_latency_p95': percentile(setups, 95),
+        'setup_latency_max': max(setups, default=None),
+        'scrub_latency_p50': percentile(scrubs, 50),
+        'scrub_latency_p95': percentile(scrubs, 95),
+        'scrub_latency_max': max(scrubs, default=None),
+    }
+
+
+def ms(value):
+    return '-' if value is None else f"{value * 1000:.1f}ms"
+
+
+async def runLoad(args):
+    sessions = [LoadSession(i, args.host, args.port, args.base_port + i, args.file)
+                for i in range(args.sessions)]
+    start = time.perf_counter()
+    tasks = []
+    for session in sessions:
+        tasks.append(asyncio.create_task(session.run(args.duration, args.scrub_every)))
+        if args.ramp:
+            await asyncio.sleep(args.ramp)
+    await asyncio.gather(*tasks)
+    return [s.stats() for s in sessions], time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Headless RTSP load generator')
+    parser.add_argument('host', help='server address')
+    parser.add_argument('port', type=int, help='server RTSP port')
+    parser.add_argument('file', help='video file to request')
+    parser.add_argument('-n', '--sessions', type=int, default=100, help='simulated sessions')
+    parser.add_argument('-d', '--duration', type=float, default=10.0, help='seconds each session plays')
+    parser.add_argument('--base-port', type=int, default=20000, help='first local RTP port, one per session')
+    parser.add_argument('--ramp', type=float, default=0.01, help='seconds between session starts')
+    parser.add_argument('--scrub-every', type=float, default=0.0, help='seek every N seconds (0 disables)')
+    parser.add_argument('--per-session', action='store_true', help='print a line per session')
+    parser.add_argument('--json', help='write per-session and aggregate results to this file')
+    args = parser.parse_args()
+
+    results, elapsed = asyncio.run(runLoad(args))
+    summary = summarize(results, elapsed)
+
+    if args.per_session:
+        for r in results:
+            scrub = percentile(r['scrub_latencies'], 50)
+            print(f"session {r['session']:>4}: {r['fps']:6.1f} fps {r['bytes_per_s'] / 1024:8.1f} KB/s "
+                  f"loss {r['loss'] * 100:5.2f}% setup {ms(r['setup_latency'])} scrub p50 {ms(scrub)}"
+                  + (f" ERROR {r['error']}" if r['error'] else ''))
+
+    print(f"Sessions: {summary['sessions']} ({summary['failed']} failed, {summary['rejected']} rejected with 503) "
+          f"in {elapsed:.1f}s")
+    print(f"Frames/s: {summary['aggregate_fps']:.1f} aggregate, {summary['mean_session_fps']:.1f} mean, "
+          f"{summary['min_session_fps']:.1f} min per session")
+    print(f"Throughput: {summary['aggregate_bytes_per_s'] / 1024 / 1024:.2f} MB/s, "
+          f"packet loss {summary['loss'] * 100:.2f}%")
+    print(f"SETUP latency: p50 {ms(summary['setup_latency_p50'])}, p95 {ms(summary['setup_latency_p95'])}, "
+          f"max {ms(summary['setup_latency_max'])}")
+    print(f"Scrub to first frame: p50 {ms(summary['scrub_latency_p50'])}, "
+          f"p95 {ms(summary['scrub_latency_p95'])}, max {ms(summary['scrub_latency_max'])}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'summary': summary, 'sessions': results}, f, indent=1)
+    sys.exit(1 if summary['failed'] else 0)
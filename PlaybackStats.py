@@ -0,0 +1,168 @@
+import csv
+import json
+import threading
+import time
+from collections import deque
+
+from RtpPacket import RTP_CLOCK_RATE
+
+FPS_WINDOW = 1.0         #seconds of arrivals the received frame rate is measured over
+MAX_FRAME_RECORDS = 100000
+
+
+class PlaybackStats:
+    """Client-side playback statistics, from packet arrival to the frame on screen.
+
+    Packets and frames are counted by the RTP listener, decode and resize times
+    by the renderer's decoders and render times on the Tk thread. Comparing the
+    three tells network loss and server pacing (gaps, late frames) apart from
+    a slow client (long decode or render times, frames decoded but never shown).
+    """
+
+    def __init__(self, frameRate=20.0):
+        self.lock = threading.Lock()
+        self.frameRate = frameRate
+        self.started = time.monotonic()
+        self.packets = 0
+        self.bytes = 0
+        self.lostPackets = 0
+        self.reorderedPackets = 0
+        self.framesReceived = 0
+        self.lateFrames = 0
+        self.framesRendered = 0
+        self.timings = {timing: [0, 0.0, 0.0] for timing in ('decode', 'resize', 'render')}    #count, total, max
+        self.arrivals = deque()
+        self.frames = {}    #frame number -> record, until rendered or evicted
+        self.records = deque(maxlen=MAX_FRAME_RECORDS)
+        self.feedbackBase = (0, 0)    #packets and losses at the last feedback report
+        self.buffer = None    #JitterBuffer whose depth and underruns are reported
+        self.restart()
+
+    def restart(self):
+        """Start a new sequence run, e.g. on PLAY, after a seek or a new socket."""
+        with self.lock:
+            self.highestSeq = None
+            self.transitBase = None
+            self.arrivals.clear()
+
+    def packetReceived(self, rtpPacket, size):
+        with self.lock:
+            self.packets += 1
+            self.bytes += size
+            seq = rtpPacket.seqNum()
+            if self.highestSeq is None:
+                self.highestSeq = seq
+                return
+            delta = (seq - self.highestSeq) & 0xFFFF
+            if delta == 0:
+                self.reorderedPackets += 1    #duplicate
+            elif delta < 0x8000:
+                self.lostPackets += delta - 1
+                self.highestSeq = seq
+            else:
+                # Older than the newest packet: it was counted lost when skipped over
+                self.reorderedPackets += 1
+                self.lostPackets = max(0, self.lostPackets - 1)
+
+    def frameReceived(self, frameNbr, timestamp):
+        """Record a reassembled frame and whether it arrived later than its RTP timestamp allows."""
+        now = time.monotonic()
+        with self.lock:
+            self.framesReceived += 1
+            self.arrivals.append(now)
+            while self.arrivals[0] < now - FPS_WINDOW:
+                self.arrivals.popleft()
+
+            # Transit time relative to the fastest frame of this run
+            transit = now - timestamp / RTP_CLOCK_RATE
+            if self.transitBase is None or transit < self.transitBase:
+                self.transitBase = transit
+            delay = transit - self.transitBase
+            late = delay > 1.0 / self.frameRate
+            if late:
+                self.lateFrames += 1
+
+            record = {'frame': frameNbr, 'arrival': now - self.started, 'delay': delay, 'late': late,
+                      'decode': None, 'resize': None, 'render': None}
+            self.records.append(record)
+            self.frames[frameNbr] = record
+            if len(self.frames) > 64:
+                self.frames.pop(next(iter(self.frames)))
+
+    def time(self, timing, frameNbr, seconds):
+        with self.lock:
+            entry = self.timings[timing]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            record = self.frames.get(frameNbr)
+            if record is not None:
+                record[timing] = seconds
+            if timing == 'render':
+                self.framesRendered += 1
+                self.frames.pop(frameNbr, None)
+
+    def fps(self):
+        with self.lock:
+            if len(self.arrivals) < 2:
+                return 0.0
+            return (len(self.arrivals) - 1) / max(1e-6, self.arrivals[-1] - self.arrivals[0])
+
+    def feedback(self):
+        """Return the loss since the previous call and the current frame rate, reported to the server."""
+        fps = self.fps()
+        with self.lock:
+            packets = self.packets - self.feedbackBase[0]
+            lost = self.lostPackets - self.feedbackBase[1]
+            self.feedbackBase = (self.packets, self.lostPackets)
+        expected = packets + lost
+        return {'loss': lost / expected if expected > 0 else 0.0, 'fps': fps}
+
+    def summary(self):
+        fps = self.fps()
+        with self.lock:
+            expected = self.packets + self.lostPackets
+            stats = {
+                'elapsed': time.monotonic() - self.started,
+                'fps': fps,
+                'packets': self.packets,
+                'bytes': self.bytes,
+                'lost_packets': self.lostPackets,
+                'loss': self.lostPackets / expected if expected else 0.0,
+                'reordered_packets': self.reorderedPackets,
+                'frames_received': self.framesReceived,
+                'late_frames': self.lateFrames,
+                'frames_rendered': self.framesRendered,
+            }
+            for timing, (count, total, worst) in self.timings.items():
+                stats[timing + '_ms_mean'] = total / count * 1000 if count else 0.0
+                stats[timing + '_ms_max'] = worst * 1000
+        if self.buffer is not None:
+            stats.update(self.buffer.stats())
+        return stats
+
+    def overlayText(self):
+        s = self.summary()
+        text = (f"{s['fps']:.1f} fps  loss {s['loss'] * 100:.1f}%  late {s['late_frames']}  "
+                f"shown {s['frames_rendered']}/{s['frames_received']}\n"
+                f"decode {s['decode_ms_mean']:.1f}ms  resize {s['resize_ms_mean']:.1f}ms  "
+                f"render {s['render_ms_mean']:.1f}ms")
+        if self.buffer is not None:
+            text += (f"\nbuffer {s['buffer_ms']:.0f}ms ({s['buffer_frames']} frames)  "
+                     f"underruns {s['buffer_underruns']}")
+        return text
+
+    def dump(self, path):
+        """Write the summary and per-frame records, as JSON or (by extension) CSV."""
+        summary = self.summary()
+        with self.lock:
+            records = list(self.records)
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(records[0]) if records else ['frame'])
+                writer.writeheader()
+                writer.writerows(records)
+        else:
+            with open(path, 'w') as f:
+                json.dump({'summary': summary, 'frames': records}, f, indent=1)
+        return summary
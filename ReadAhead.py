@@ -0,0 +1,266 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_DEPTH = 16        #frames read ahead of the sender
+RETRY_INTERVAL = 0.05     #seconds between reads at the end of a file still being converted
+PAGE_SIZE = 4096
+PREFETCH_WORKERS = 4      #threads of the shared pool refilling the rings of every stream
+
+
+class ReadAheadStream:
+    """A video stream whose next frames are read by a background producer.
+
+    The producer keeps a ring of up to depth frames ahead of the sender, so
+    the pacing loop only pops frames from memory and a slow read (a cold
+    page cache, a network filesystem stall) is absorbed by the ring instead
+    of delaying the frame being sent. Seeks within the ring just drop frames,
+    others flush it. When the ring is empty the sender skips the tick, after
+    waiting at most half a frame interval for the frame being read unless
+    block is False, and the underrun is counted.
+
+    Nothing is read before start(). The producer is a thread of its own, or
+    with an executor, refills queued on that shared pool whenever the ring
+    has room, so streams do not each hold a thread. Seeks, feedback and
+    close never wait for a read in progress, which may be slow: the read's
+    frame is discarded and the producer applies them when the read returns.
+    """
+
+    def __init__(self, source, depth=DEFAULT_DEPTH, metrics=None, block=True, executor=None):
+        self.source = source      #VideoStream or AdaptiveStream, only read by the producer once wrapped
+        self.depth = depth
+        self.block = block        #False for senders that must never wait, like an event loop
+        self.metrics = metrics    #SessionMetrics of the sender, None to skip reporting
+        self.executor = executor  #shared pool running refills, None for a producer thread
+        self.ring = deque()       #(frame number after the frame, data) in playback order
+        self.cond = threading.Condition()
+        self.readLock = threading.Lock()    #serializes producer reads and seeks of the source
+        self.generation = 0       #bumped by flushes, frames read for an older one are dropped
+        self.position = source.frameNbr()
+        self.atEnd = False
+        self.started = False
+        self.refilling = False    #a refill is queued or running on the executor
+        self.pendingSeek = None   #frame the producer seeks to before its next read
+        self.pendingFeedback = None   #(loss, fps) the producer applies before its next read
+        self.closed = False
+        self.sourceClosed = False
+
+    def __getattr__(self, name):
+        if name == 'source':
+            raise AttributeError(name)
+        return getattr(self.source, name)    #filename, frame_rate, rendition, ...
+
+    def start(self):
+        """Start reading ahead, once the stream is played."""
+        with self.cond:
+            if self.started or self.closed:
+                return
+            self.started = True
+            if self.executor is not None:
+                self._refillLater()
+                return
+        threading.Thread(target=self.produce, name='ReadAhead', daemon=True).start()
+
+    def produce(self):
+        while True:
+            with self.cond:
+                while len(self.ring) >= self.depth and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+            if not self.fill():
+                with self.cond:
+                    self.cond.wait(RETRY_INTERVAL)
+
+    def refill(self):
+        """Read frames on an executor thread until the ring is full or the source runs dry."""
+        while True:
+            with self.cond:
+                if self.closed or len(self.ring) >= self.depth:
+                    self.refilling = False
+                    return
+            if not self.fill():
+                with self.cond:
+                    self.refilling = False    #the sender's next pop tries again
+                return
+
+    def _refillLater(self):
+        """Queue a refill on the executor if the ring has room, called with cond held."""
+        if (self.executor is None or not self.started or self.refilling or self.closed
+                or len(self.ring) >= self.depth):
+            return
+        self.refilling = True
+        try:
+            self.executor.submit(self.refill)
+        except RuntimeError:
+            self.refilling = False    #executor shut down with the server
+
+    def fill(self):
+        """Read one frame into the ring, returns False at the end of what can be read."""
+        with self.readLock:
+            if not self._applyPending():
+                return False
+            generation = self.generation
+            start = time.perf_counter()
+            data = self.source.nextFrame()
+            if isinstance(data, memoryview):
+                # Fault the pages of a memory-mapped frame in now rather than in the sender
+                data[::PAGE_SIZE].tobytes()
+            elapsed = time.perf_counter() - start
+            frameNbr = self.source.frameNbr()
+        if self.closed:
+            # Closed during the read, the sender left the source to this thread
+            with self.readLock:
+                self._closeSource()
+            return False
+        if self.metrics is not None:
+            self.metrics.time('prefetch', elapsed)
+        with self.cond:
+            if generation != self.generation:
+                return True
+            if data is None:
+                # End of file, or of what a conversion has written so far
+                self.atEnd = True
+                return False
+            self.atEnd = False
+            self.ring.append((frameNbr, data))
+            self.cond.notify_all()
+            return True
+
+    def _applyPending(self):
+        """Apply the seek or feedback requested while a read was running, called with readLock held.
+
+        Returns False once the stream is closed.
+        """
+        with self.cond:
+            if self.closed:
+                closed = True
+            else:
+                closed = False
+                seek, self.pendingSeek = self.pendingSeek, None
+                feedback, self.pendingFeedback = self.pendingFeedback, None
+        if closed:
+            self._closeSource()
+            return False
+        if feedback is not None:
+            try:
+                if self._report(*feedback) and self.metrics is not None:
+                    self.metrics.count('rendition_switches')
+            except (ValueError, OSError) as e:
+                print(f"Feedback not applied: {e}")
+        if seek is not None and not self.source.set_frame(seek):
+            print(f"Cannot seek to frame {seek}")
+            with self.cond:
+                self.position = self.source.frameNbr()
+        return True
+
+    def _closeSource(self):
+        """Close the source once, called with readLock held."""
+        if not self.sourceClosed:
+            self.sourceClosed = True
+            self.source.close()
+
+    def nextFrame(self):
+        with self.cond:
+            if self.closed:
+                return None
+            if not self.ring and not self.atEnd and self.block and self.started:
+                self.cond.wait(0.5 / self.source.frame_rate)
+            if not self.ring:
+                if not self.atEnd and self.started and self.metrics is not None:
+                    self.metrics.count('readahead_underruns')
+                self._refillLater()
+                return None
+            self.position, data = self.ring.popleft()
+            if self.metrics is not None:
+                self.metrics.gauge('readahead_frames', len(self.ring))
+            self.cond.notify_all()
+            self._refillLater()
+            return data
+
+    def frameNbr(self):
+        return self.position
+
+    def get_total_frames(self):
+        return self.source.get_total_frames()
+
+    def set_frame(self, frame_number):
+        with self.cond:
+            # Within the ring, e.g. frames skipped by a late sender
+            while self.ring and self.ring[0][0] <= frame_number:
+                self.ring.popleft()
+            if self.ring and self.ring[0][0] == frame_number + 1:
+                self.position = frame_number
+                self.cond.notify_all()
+                self._refillLater()
+                return True
+            if not self.readLock.acquire(blocking=False):
+                # A read is running, possibly a slow one: drop it and let the producer seek
+                if not 0 <= frame_number <= self.source.get_total_frames():
+                    return False
+                self._drop()
+                self.pendingSeek = frame_number
+                self.position = frame_number
+                self._refillLater()
+                return True
+        try:
+            with self.cond:
+                self._drop()
+                result = self.source.set_frame(frame_number)
+                self.position = self.source.frameNbr()
+                self._refillLater()
+        finally:
+            self.readLock.release()
+        return result
+
+    def _drop(self):
+        """Discard the ring and any read in progress, called with cond held."""
+        self.generation += 1
+        self.ring.clear()
+        self.atEnd = False
+        self.cond.notify_all()
+
+    def _report(self, loss, fps):
+        """Apply feedback to the source and re-read from the sender's position, called with readLock held."""
+        if not self.source.report(loss, fps):
+            return False
+        with self.cond:
+            self._drop()
+            self.source.set_frame(self.position)
+            self._refillLater()
+        return True
+
+    def report(self, loss, fps):
+        """Apply client feedback to an AdaptiveStream, re-reading the ring from the new rendition.
+
+        While a read is running the feedback is left to the producer, which
+        counts the switch itself, and False is returned.
+        """
+        if not self.readLock.acquire(blocking=False):
+            with self.cond:
+                self.pendingFeedback = (loss, fps)
+                self._refillLater()
+            return False
+        try:
+            return self._report(loss, fps)
+        finally:
+            self.readLock.release()
+
+    def close(self):
+        """Stop the producer and close the source, the stream can no longer be read.
+
+        A source still being read is closed by the producer once its read returns.
+        """
+        with self.cond:
+            self.closed = True
+            self.ring.clear()
+            self.cond.notify_all()
+        if self.readLock.acquire(blocking=False):
+            try:
+                self._closeSource()
+            finally:
+                self.readLock.release()
+
+
+shared_prefetch = ThreadPoolExecutor(PREFETCH_WORKERS, thread_name_prefix='ReadAhead')
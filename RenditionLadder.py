@@ -0,0 +1,53 @@
+import os
+import json
+from typing import List, Optional, Tuple
+
+# Renditions from best to worst; the first one keeps the converter's default settings
+DEFAULT_LADDER = [
+    {'name': '360p', 'scale': '640:360', 'bitrate': '1000k'},
+    {'name': '240p', 'scale': '426:240', 'bitrate': '500k'},
+    {'name': '180p', 'scale': '320:180', 'bitrate': '250k'},
+]
+
+LADDER_EXT = '.ladder.json'
+
+
+def ladder_path(video: str) -> str:
+    """Path of the rendition manifest written next to the top rendition"""
+    return video + LADDER_EXT
+
+
+def rendition_path(output_file: str, name: str, top: bool = False) -> str:
+    """The top rendition keeps the requested name, the others get a _<name> suffix"""
+    if top:
+        return output_file
+    root, ext = os.path.splitext(output_file)
+    return f"{root}_{name}{ext}"
+
+
+def save_ladder(output_file: str, ladder: List[dict]):
+    """Writes the manifest listing every rendition of output_file, best first"""
+    renditions = []
+    for n, rendition in enumerate(ladder):
+        path = rendition_path(output_file, rendition['name'], top=n == 0)
+        renditions.append(dict(rendition, file=os.path.basename(path)))
+    temp_path = ladder_path(output_file) + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'renditions': renditions}, f, indent=1)
+    os.replace(temp_path, ladder_path(output_file))
+
+
+def load_ladder(video: str) -> Optional[List[Tuple[str, str]]]:
+    """
+    Reads the manifest of video
+    Returns: [(name, path)] best first, None without a usable manifest
+    """
+    try:
+        with open(ladder_path(video)) as f:
+            renditions = json.load(f)['renditions']
+    except (OSError, ValueError, KeyError):
+        return None
+    base = os.path.dirname(os.path.abspath(video))
+    ladder = [(r['name'], os.path.join(base, r['file'])) for r in renditions]
+    ladder = [(name, path) for name, path in ladder if os.path.exists(path)]
+    return ladder if len(ladder) > 1 else None
@@ -0,0 +1,159 @@
+import struct
+
+from RtpPacket import HEADER_SIZE, RTP_CLOCK_RATE, packHeader
+
+# RFC 2435-style main JPEG header carried at the start of every RTP payload.
+#   word 0: type-specific (8 bits) | fragment offset (24 bits)
+#   word 1: frame number the fragment belongs to
+# The fragment offset is the byte offset of this fragment within the frame,
+# the RTP marker bit is set on the last fragment of a frame.
+JPEG_HEADER = struct.Struct('!II')
+JPEG_HEADER_SIZE = JPEG_HEADER.size
+# RTP and JPEG headers are written back to back in front of each fragment
+PACKET_HEADER_SIZE = HEADER_SIZE + JPEG_HEADER_SIZE
+
+DEFAULT_MTU = 1500
+IP_UDP_OVERHEAD = 20 + 8
+MAX_FRAGMENT_OFFSET = 0xFFFFFF
+
+
+def maxFragmentSize(mtu=DEFAULT_MTU):
+    """Largest frame slice that fits in one datagram without IP fragmentation."""
+    return mtu - IP_UDP_OVERHEAD - HEADER_SIZE - JPEG_HEADER_SIZE
+
+
+def fragmentFrame(frame, frameNbr, fragmentSize):
+    """Split a frame into (fragment offset, fragment, marker) triples.
+
+    Fragments are memoryview slices of the frame, the frame data is only
+    copied by the kernel when the datagram is sent.
+    """
+    if len(frame) > MAX_FRAGMENT_OFFSET:
+        raise ValueError(f"Frame {frameNbr} is too large to fragment: {len(frame)} bytes")
+    view = memoryview(frame)
+    fragments = []
+    offset = 0
+    while True:
+        chunk = view[offset:offset + fragmentSize]
+        last = offset + len(chunk) >= len(frame)
+        fragments.append((offset, chunk, 1 if last else 0))
+        if last:
+            return fragments
+        offset += fragmentSize
+
+
+class RtpJpegPacketizer:
+    """Turns frames into RTP/JPEG packets of one RTP stream.
+
+    Keeps the stream's sequence number and a header buffer reused for every
+    frame, so each sender (a session or a shared channel) owns one.
+    """
+
+    PAYLOAD_TYPE = 26    #MJPEG
+
+    def __init__(self, mtu=DEFAULT_MTU, ssrc=0):
+        self.mtu = mtu
+        self.ssrc = ssrc
+        self.seqNum = 0             #RTP sequence number, incremented per packet
+        self.headers = bytearray()  #RTP/JPEG headers of the frame being sent
+
+    def packetize(self, payload, frameNbr, frameRate):
+        """RTP-packetize a frame into MTU-sized fragments.
+
+        Each packet is a (headers, fragment) pair of buffers for sendmsg; the
+        headers are views into a buffer reused for every frame, so packets must
+        be sent before the next call.
+        """
+        timestamp = int(frameNbr * RTP_CLOCK_RATE / frameRate)   #all fragments of a frame share its timestamp
+
+        fragments = fragmentFrame(payload, frameNbr, maxFragmentSize(self.mtu))
+        size = len(fragments) * PACKET_HEADER_SIZE
+        if len(self.headers) < size:
+            self.headers = bytearray(size)   #grow by replacing, views of the old one may still be alive
+        headers = memoryview(self.headers)
+
+        packets = []
+        offset = 0
+        for fragmentOffset, fragment, marker in fragments:
+            self.seqNum = (self.seqNum + 1) & 0xFFFF
+            packHeader(self.headers, offset, 2, 0, 0, 0,
+                       self.seqNum, marker, self.PAYLOAD_TYPE, self.ssrc, timestamp)
+            JPEG_HEADER.pack_into(self.headers, offset + HEADER_SIZE, fragmentOffset, frameNbr)
+            # fragment is a view into the frame, the kernel gathers it straight into the datagram
+            packets.append((headers[offset:offset + PACKET_HEADER_SIZE], fragment))
+            offset += PACKET_HEADER_SIZE
+
+        return packets   #the last one carries the marker bit
+
+
+def parseFragment(payload):
+    """Return (frame number, fragment offset, fragment data) of an RTP payload."""
+    word0, frameNbr = JPEG_HEADER.unpack_from(payload)
+    return frameNbr, word0 & MAX_FRAGMENT_OFFSET, payload[JPEG_HEADER_SIZE:]
+
+
+class FrameReassembler:
+    """Rebuilds frames from RTP/JPEG fragments.
+
+    Fragments may arrive in any order. A frame is released once every byte up
+    to the fragment carrying the marker bit has arrived; frames older than the
+    newest released frame, or pushed out of the pending window, are dropped.
+    Without ordered, older frames may still complete until expire() is called,
+    for a jitter buffer that puts them back in order.
+    """
+
+    def __init__(self, maxPending=8, ordered=True):
+        self.maxPending = maxPending
+        self.ordered = ordered
+        self.pending = {}    #frame number -> [fragments by offset, received bytes, total size]
+        self.lastFrame = -1
+        self.framesCompleted = 0
+        self.framesDropped = 0
+
+    def reset(self):
+        """Forget partial frames, e.g. after a seek."""
+        self.framesDropped += len(self.pending)
+        self.pending.clear()
+        self.lastFrame = -1
+
+    def addPacket(self, rtpPacket):
+        """Add one RTP packet; return (frame number, frame) when a frame completes."""
+        frameNbr, offset, data = parseFragment(rtpPacket.getPayload())
+        if frameNbr <= self.lastFrame:
+            return None    #late fragment of a frame already played or dropped
+
+        entry = self.pending.get(frameNbr)
+        if entry is None:
+            if len(self.pending) >= self.maxPending:
+                self.pending.pop(min(self.pending))
+                self.framesDropped += 1
+            entry = self.pending[frameNbr] = [{}, 0, None]
+        fragments = entry[0]
+        if offset in fragments:
+            return None    #duplicate
+        fragments[offset] = bytes(data)    #data may be a view into a reused receive buffer
+        entry[1] += len(data)
+        if rtpPacket.marker():
+            entry[2] = offset + len(data)
+
+        if entry[2] is None or entry[1] < entry[2]:
+            return None
+
+        del self.pending[frameNbr]
+        frame = b''.join(fragments[o] for o in sorted(fragments))
+        if len(frame) != entry[2]:
+            self.framesDropped += 1    #overlapping fragments, cannot trust the frame
+            return None
+
+        self.framesCompleted += 1
+        if self.ordered:
+            # Anything older than this frame can no longer be shown in order
+            self.expire(frameNbr)
+        return frameNbr, frame
+
+    def expire(self, frameNbr):
+        """Drop partial frames up to frameNbr and ignore their late fragments."""
+        for stale in [n for n in self.pending if n <= frameNbr]:
+            del self.pending[stale]
+            self.framesDropped += 1
+        self.lastFrame = max(self.lastFrame, frameNbr)
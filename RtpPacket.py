@@ -1,51 +1,51 @@
 import sys
+import struct
 from time import time
 HEADER_SIZE = 12
+RTP_CLOCK_RATE = 90000    # RTP timestamp units per second for video payloads
+
+# Fixed RTP header (RFC 3550):
+#   byte 0: version (2 bits) | padding (1) | extension (1) | CSRC count (4)
+#   byte 1: marker (1 bit) | payload type (7)
+#   16-bit sequence number, 32-bit timestamp, 32-bit SSRC
+RTP_HEADER = struct.Struct('!BBHII')
+
+
+def packHeader(buffer, offset, version, padding, extension, cc, seqnum, marker, pt, ssrc, timestamp):
+    """Write an RTP header into buffer at offset without allocating."""
+    RTP_HEADER.pack_into(buffer, offset,
+                         (version << 6 | padding << 5 | extension << 4 | (cc & 0x0F)) & 0xFF,
+                         (marker << 7 | (pt & 0x7F)) & 0xFF,
+                         seqnum & 0xFFFF, timestamp & 0xFFFFFFFF, ssrc & 0xFFFFFFFF)
 
 
 class RtpPacket:
-    header = bytearray(HEADER_SIZE)
+    __slots__ = ('header', 'payload')
 
     def __init__(self):
-        pass
+        self.header = bytearray(HEADER_SIZE)   #reused by every encode of this packet
+        self.payload = b''
 
-    def encode(self, version, padding, extension, cc, seqnum, marker, pt, ssrc, payload):
+    def encode(self, version, padding, extension, cc, seqnum, marker, pt, ssrc, payload, timestamp=None):
         """Encode the RTP packet with header fields and payload."""    #setting different header bits
-        timestamp = int(time())
-        header = bytearray(HEADER_SIZE)   #header of 12 bytes
-        # --------------
-        # TO COMPLETE
-        # --------------
-        # Fill the header bytearray with RTP header fields
-
-        header[0] = (header[0] | version << 6) & 0xC0    				# 2 bits
-        header[0] = (header[0] | padding << 5) 				# 1 bit
-        header[0] = (header[0] | extension << 4)               # 1 bit
-        header[0] = (header[0] | (cc & 0x0F))                  # 4 bits
-        header[1] = (header[1] | marker << 7)                  # 1 bit
-        header[1] = (header[1] | (pt & 0x7f))                  # 7 bits
-        # 16 bits total, this is first 8
-        header[2] = (seqnum & 0xFF00) >> 8
-        header[3] = (seqnum & 0xFF)                            # second 8
-        # 32 bit timestamp
-        header[4] = (timestamp >> 24)
-        header[5] = (timestamp >> 16) & 0xFF
-        header[6] = (timestamp >> 8) & 0xFF
-        header[7] = (timestamp & 0xFF)
-        header[8] = (ssrc >> 24)                               # 32 bit ssrc
-        header[9] = (ssrc >> 16) & 0xFF
-        header[10] = (ssrc >> 8) & 0xFF
-        header[11] = ssrc & 0xFF
-
-        self.header = header
+        if timestamp is None:
+            timestamp = int(time())
+        if not isinstance(self.header, bytearray):
+            self.header = bytearray(HEADER_SIZE)   #was a view into a received datagram
+        packHeader(self.header, 0, version, padding, extension, cc, seqnum, marker, pt, ssrc, timestamp)
 
         # Get the payload from the argument
         self.payload = payload
 
     def decode(self, byteStream):
-        """Decode the RTP packet."""    #decode that bytearray
-        self.header = bytearray(byteStream[:HEADER_SIZE])
-        self.payload = byteStream[HEADER_SIZE:]
+        """Decode the RTP packet.
+
+        byteStream may be a recv_into buffer: header and payload are views of
+        it and stay valid only until the buffer is reused.
+        """
+        view = memoryview(byteStream)
+        self.header = view[:HEADER_SIZE]
+        self.payload = view[HEADER_SIZE:]
 
     def version(self):
         """Return RTP version."""
@@ -61,6 +61,10 @@ class RtpPacket:
         timestamp = self.header[4] << 24 | self.header[5] << 16 | self.header[6] << 8 | self.header[7]
         return int(timestamp)
 
+    def marker(self):
+        """Return marker bit."""
+        return int(self.header[1] >> 7)
+
     def payloadType(self):
         """Return payload type."""
         pt = self.header[1] & 127   #return type of data
@@ -70,6 +74,10 @@ class RtpPacket:
         """Return payload."""   #return actual data
         return self.payload
 
+    def getBuffers(self):
+        """Return (header, payload) for a scatter-gather send, nothing is copied."""
+        return self.header, self.payload
+
     def getPacket(self):
         """Return RTP packet."""
-        return self.header + self.payload
+        return b''.join((self.header, self.payload))
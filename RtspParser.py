@@ -0,0 +1,118 @@
+import re
+
+MAX_HEADER_SIZE = 8192               #bytes of start line and headers a message may have
+MAX_BODY_SIZE = 64 * 1024 * 1024     #largest Content-Length accepted, thumbnail tracks of long videos are big
+HEADER_END = re.compile(rb'\r?\n\r?\n')
+
+
+class RtspParseError(ValueError):
+    """Input that cannot be framed as RTSP messages, the connection should be closed."""
+
+
+class RtspMessage:
+    """One RTSP request or reply: start line, headers and body."""
+
+    def __init__(self, startLine, headers, body=b''):
+        self.startLine = startLine
+        self.headers = headers    #lower-case name -> value
+        self.body = body
+        if startLine.startswith('RTSP/'):
+            # Reply: "RTSP/1.0 200 OK"
+            self.method = self.uri = None
+            self.version, _, status = startLine.partition(' ')
+            code, _, self.reason = status.partition(' ')
+            try:
+                self.statusCode = int(code)
+            except ValueError:
+                raise RtspParseError(f'bad status line {startLine!r}')
+        else:
+            # Request: "SETUP movie.Mjpeg RTSP/1.0", the URI may contain spaces
+            self.statusCode = self.reason = None
+            self.method, _, rest = startLine.partition(' ')
+            self.uri, _, self.version = rest.rpartition(' ')
+            if not self.uri:
+                self.uri, self.version = self.version, ''
+        try:
+            self.cseq = int(headers['cseq']) if 'cseq' in headers else None
+        except ValueError:
+            raise RtspParseError(f'bad CSeq {headers["cseq"]!r}')
+
+    def header(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+    def __repr__(self):
+        return f'RtspMessage({self.startLine!r}, cseq={self.cseq}, body={len(self.body)} bytes)'
+
+
+def parseParameters(value):
+    """Return the name=value parameters of a header such as Transport, e.g. client_port."""
+    params = {}
+    for part in value.split(';'):
+        name, sep, paramValue = part.partition('=')
+        if sep:
+            params[name.strip().lower()] = paramValue.strip()
+    return params
+
+
+class RtspParser:
+    """Incremental framing of RTSP messages from a byte stream.
+
+    Data is fed as it arrives from the socket, in whatever pieces TCP
+    delivers it. A message's headers end at the first empty line (CRLF or a
+    bare LF, which this project's peers send) and its body is the next
+    Content-Length bytes. feed() returns every message completed so far in
+    order, so a request split across segments waits for its remainder and
+    several pipelined requests in one segment are all returned.
+    """
+
+    def __init__(self, maxHeaderSize=MAX_HEADER_SIZE, maxBodySize=MAX_BODY_SIZE):
+        self.maxHeaderSize = maxHeaderSize
+        self.maxBodySize = maxBodySize
+        self.buffer = bytearray()
+        self.head = None    #(start line, headers, body length) of a message waiting for its body
+
+    def feed(self, data):
+        """Add received bytes, returns the list of messages they complete."""
+        self.buffer += data
+        messages = []
+        while True:
+            if self.head is None:
+                # Line ends between messages are allowed and skipped
+                start = 0
+                while start < len(self.buffer) and self.buffer[start] in b'\r\n':
+                    start += 1
+                if start:
+                    del self.buffer[:start]
+                match = HEADER_END.search(self.buffer, 0, self.maxHeaderSize + 4)
+                if not match:
+                    if len(self.buffer) > self.maxHeaderSize:
+                        raise RtspParseError(f'headers longer than {self.maxHeaderSize} bytes')
+                    break
+                self.head = self.parseHead(bytes(self.buffer[:match.start()]))
+                del self.buffer[:match.end()]
+
+            startLine, headers, length = self.head
+            if len(self.buffer) < length:
+                break
+            body = bytes(self.buffer[:length])
+            del self.buffer[:length]
+            self.head = None
+            messages.append(RtspMessage(startLine, headers, body))
+        return messages
+
+    def parseHead(self, data):
+        lines = data.decode('utf-8', 'replace').splitlines()
+        startLine = lines[0].strip()
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if not sep:
+                raise RtspParseError(f'bad header line {line!r}')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise RtspParseError(f'bad Content-Length {headers["content-length"]!r}')
+        if not 0 <= length <= self.maxBodySize:
+            raise RtspParseError(f'Content-Length {length} out of range')
+        return startLine, headers, length
@@ -1,17 +1,82 @@
 import sys, socket
+import argparse
 
 from ServerWorker import ServerWorker
+from FrameCache import shared_cache
+from FrameScheduler import FrameScheduler
+from SharedChannel import ChannelRegistry
+from TranscodeCache import shared_transcodes
+from ServerMetrics import shared_metrics
+from ReadAhead import shared_prefetch
 
 class Server:	
 	
 	def main(self):
-		try:
-			SERVER_PORT = int(sys.argv[1])  #port number as a system argument on which server is running
-		except:
-			print("[Usage: Server.py Server_port]\n")
+		parser = argparse.ArgumentParser(description='RTSP video streaming server')
+		parser.add_argument('port', type=int, help='port number on which server is running')
+		parser.add_argument('--engine', choices=['thread', 'async'], default='thread',
+							help='thread: one thread per client, async: all sessions on one event loop')
+		parser.add_argument('--frame-cache-mb', type=int, default=64,
+							help='size of the frame cache shared by sessions streaming the same file (0 disables)')
+		parser.add_argument('--mmap', action='store_true',
+							help='memory-map video files and send frames without copying them')
+		parser.add_argument('--transcode-cache-dir', default='transcode_cache',
+							help='directory holding converted copies of non-MJPEG videos')
+		parser.add_argument('--transcode-cache-mb', type=int, default=10240,
+							help='disk budget of the transcode cache')
+		parser.add_argument('--progressive', action='store_true',
+							help='start streaming non-MJPEG videos while ffmpeg is still converting them')
+		parser.add_argument('--pacer-threads', type=int, default=4,
+							help='threads sending frames for all playing sessions (thread engine)')
+		parser.add_argument('--delivery', choices=['unicast', 'fanout', 'multicast'], default='unicast',
+							help='unicast: every session reads and packetizes its own frames, '
+								 'fanout/multicast: sessions at the same position of a file share one channel')
+		parser.add_argument('--multicast-interface', default='0.0.0.0',
+							help='local interface address multicast channels are sent from')
+		parser.add_argument('--read-ahead', type=int, default=16, metavar='FRAMES',
+							help='frames read ahead of the sender once a stream plays, by a thread per stream (thread engine) '
+								 'or a shared pool (async engine), 0 reads while sending')
+		parser.add_argument('--max-sessions', type=int, default=0,
+							help='connections served at once, further ones are answered 503 (0 unlimited)')
+		parser.add_argument('--max-playing', type=int, default=0,
+							help='streams playing at once, further PLAYs are answered 503 (0 unlimited)')
+		parser.add_argument('--bandwidth-mbps', type=float, default=0,
+							help='outbound video budget shared by all streams in Mbit/s (0 unlimited)')
+		parser.add_argument('--accept-backlog', type=int, default=16,
+							help='connections the kernel queues before they are accepted')
+		parser.add_argument('--session-timeout', type=float, default=60,
+							help='seconds a session that is not playing may go without a request before it is reaped (0 never)')
+		parser.add_argument('--metrics-port', type=int, default=0,
+							help='serve Prometheus metrics on http://127.0.0.1:PORT/metrics (0 disables)')
+		args = parser.parse_args()
+		ServerWorker.scheduler = FrameScheduler(args.pacer_threads)
+		if args.delivery != 'unicast':
+			ServerWorker.channels = ChannelRegistry(ServerWorker.scheduler, args.delivery == 'multicast',
+													args.multicast_interface)
+		ServerWorker.progressive = args.progressive
+		shared_transcodes.cache_dir = args.transcode_cache_dir
+		shared_transcodes.max_bytes = args.transcode_cache_mb * 1024 * 1024
+		ServerWorker.useMmap = args.mmap
+		ServerWorker.readAhead = args.read_ahead
+		if args.engine == 'async':
+			ServerWorker.readAheadPool = shared_prefetch    #no thread per session on the event loop engine
+		ServerWorker.admission.configure(args.max_sessions, args.max_playing, args.bandwidth_mbps * 1e6 / 8)
+		ServerWorker.sessionRegistry.timeout = args.session_timeout
+		if args.session_timeout:
+			ServerWorker.sessionRegistry.start()
+		shared_cache.resize(args.frame_cache_mb * 1024 * 1024)
+		if args.metrics_port:
+			shared_metrics.serveHttp(args.metrics_port)
+		SERVER_PORT = args.port  #port number as a system argument on which server is running
+
+		if args.engine == 'async':
+			from AsyncServer import AsyncServer
+			AsyncServer(SERVER_PORT, args.accept_backlog).main()
+			return
+
 		rtspSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  #create rtsp socket
 		rtspSocket.bind(('', SERVER_PORT))  #bind that socket to serverport 
-		rtspSocket.listen(5)    #maximum connection for rtspsocket     
+		rtspSocket.listen(args.accept_backlog)    #connections waiting to be accepted
 
 		# Receive client info (address,port) through RTSP/TCP session
 		while True:
@@ -23,4 +88,5 @@ if __name__ == "__main__":
 	(Server()).main()
 
 #python Server.py 1229
-#python ClientLauncher.py 127.0.0.1 1229 1219 movie.Mjpeg 
\ No newline at end of file
+#python Server.py 1229 --engine async
+#python ClientLauncher.py 127.0.0.1 1229 1219 movie.Mjpeg 
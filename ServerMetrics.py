@@ -0,0 +1,204 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from FrameCache import shared_cache
+from AdmissionControl import shared_admission
+from SessionRegistry import shared_sessions
+
+# RFC 3550 style smoothing of the difference between consecutive lateness samples
+JITTER_GAIN = 1.0 / 16
+
+
+class SessionMetrics:
+    """Counters and timings of one RTP sender, a session or a shared channel.
+
+    Only the thread delivering the session's frames updates it, readers take
+    snapshots without locking.
+    """
+
+    COUNTERS = ('frames_sent', 'packets_sent', 'bytes_sent', 'frames_skipped', 'packets_dropped', 'scrubs',
+                'rendition_switches', 'readahead_underruns', 'frames_shed')
+    TIMINGS = ('read', 'send', 'lateness', 'prefetch')    #frame read, send calls per frame, pacing lateness,
+                                                          #disk reads of the read-ahead producer
+    GAUGES = ('readahead_frames',)    #frames buffered ahead of the sender
+
+    def __init__(self, name=''):
+        self.name = name
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.timings = {timing: [0, 0.0, 0.0] for timing in self.TIMINGS}    #count, total, max
+        self.gauges = dict.fromkeys(self.GAUGES, 0)
+        self.jitter = 0.0
+        self.lastLateness = None
+
+    def count(self, counter, n=1):
+        self.counters[counter] += n
+
+    def time(self, timing, seconds):
+        entry = self.timings[timing]
+        entry[0] += 1
+        entry[1] += seconds
+        if seconds > entry[2]:
+            entry[2] = seconds
+
+    def gauge(self, gauge, value):
+        self.gauges[gauge] = value
+
+    def late(self, seconds):
+        """Record how far behind its deadline a frame was sent."""
+        seconds = max(0.0, seconds)
+        self.time('lateness', seconds)
+        if self.lastLateness is not None:
+            self.jitter += (abs(seconds - self.lastLateness) - self.jitter) * JITTER_GAIN
+        self.lastLateness = seconds
+
+    def snapshot(self):
+        """Return a flat dict of every counter and timing."""
+        stats = dict(self.counters)
+        stats.update(self.gauges)
+        for timing, (count, total, worst) in self.timings.items():
+            stats[timing + '_count'] = count
+            stats[timing + '_seconds_total'] = total
+            stats[timing + '_seconds_max'] = worst
+        stats['jitter_seconds'] = self.jitter
+        return stats
+
+
+class ServerMetrics:
+    """Server-wide registry aggregating the metrics of every session.
+
+    Totals include sessions that already ended, so counters never go backwards.
+    """
+
+    def __init__(self):
+        self.sessions = set()
+        self.retired = SessionMetrics()
+        self.lock = threading.Lock()
+        self.httpServer = None
+
+    def add(self, metrics):
+        with self.lock:
+            self.sessions.add(metrics)
+        return metrics
+
+    def remove(self, metrics):
+        """Fold an ended session into the server totals."""
+        with self.lock:
+            if metrics not in self.sessions:
+                return
+            self.sessions.discard(metrics)
+            for counter, n in metrics.counters.items():
+                self.retired.counters[counter] += n
+            for timing, (count, total, worst) in metrics.timings.items():
+                entry = self.retired.timings[timing]
+                entry[0] += count
+                entry[1] += total
+                entry[2] = max(entry[2], worst)
+
+    def sessionSnapshots(self):
+        with self.lock:
+            sessions = list(self.sessions)
+        return {metrics.name: metrics.snapshot() for metrics in sessions}
+
+    def snapshot(self):
+        """Return server-wide totals, worst-case maxima and the active session count."""
+        sessions = self.sessionSnapshots()
+        with self.lock:
+            stats = self.retired.snapshot()
+        for session in sessions.values():
+            for key, value in session.items():
+                if key.endswith('_max'):
+                    stats[key] = max(stats[key], value)
+                elif key != 'jitter_seconds':
+                    stats[key] += value
+        stats['jitter_seconds'] = max((s['jitter_seconds'] for s in sessions.values()), default=0.0)
+        stats['sessions'] = len(sessions)
+        return stats
+
+    def prometheus(self, cache=shared_cache, admission=shared_admission, registry=shared_sessions):
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name, kind, help, samples):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{labels} {value}')
+
+        stats = self.snapshot()
+        sessions = self.sessionSnapshots()
+        family('rtsp_sessions', 'gauge', 'Sessions with an active RTP sender.', [('', stats['sessions'])])
+        for counter in SessionMetrics.COUNTERS:
+            family(f'rtsp_{counter}_total', 'counter', f'{counter.replace("_", " ").capitalize()}.',
+                   [('', stats[counter])])
+        for timing in SessionMetrics.TIMINGS:
+            name = f'rtsp_frame_{timing}_seconds'
+            lines.append(f'# HELP {name} Frame {timing} time.')
+            lines.append(f'# TYPE {name} summary')
+            lines.append(f'{name}_sum {stats[timing + "_seconds_total"]}')
+            lines.append(f'{name}_count {stats[timing + "_count"]}')
+            family(f'{name}_max', 'gauge', f'Worst frame {timing} time.', [('', stats[timing + '_seconds_max'])])
+        family('rtsp_jitter_seconds', 'gauge', 'Worst pacing jitter of any session.', [('', stats['jitter_seconds'])])
+        family('rtsp_readahead_frames', 'gauge', 'Frames read ahead of all senders.', [('', stats['readahead_frames'])])
+
+        # Per-session series to find the overloaded ones
+        family('rtsp_session_frames_sent_total', 'counter', 'Frames sent by the session.',
+               [(f'{{session="{name}"}}', s['frames_sent']) for name, s in sessions.items()])
+        family('rtsp_session_lateness_seconds_max', 'gauge', 'Worst pacing lateness of the session.',
+               [(f'{{session="{name}"}}', s['lateness_seconds_max']) for name, s in sessions.items()])
+        family('rtsp_session_jitter_seconds', 'gauge', 'Pacing jitter of the session.',
+               [(f'{{session="{name}"}}', s['jitter_seconds']) for name, s in sessions.items()])
+        family('rtsp_session_readahead_frames', 'gauge', 'Frames read ahead of the session.',
+               [(f'{{session="{name}"}}', s['readahead_frames']) for name, s in sessions.items()])
+
+        if cache is not None:
+            cacheStats = cache.stats()
+            for key in ('hits', 'misses', 'evictions'):
+                family(f'rtsp_frame_cache_{key}_total', 'counter', f'Frame cache {key}.', [('', cacheStats[key])])
+            family('rtsp_frame_cache_bytes', 'gauge', 'Bytes held by the frame cache.', [('', cacheStats['bytes'])])
+
+        if admission is not None:
+            admissionStats = admission.stats()
+            family('rtsp_admitted_sessions', 'gauge', 'Sessions counted against the session cap.',
+                   [('', admissionStats['sessions'])])
+            family('rtsp_admitted_playing', 'gauge', 'Streams counted against the playing cap.',
+                   [('', admissionStats['playing'])])
+            family('rtsp_reserved_bytes_per_second', 'gauge', 'Bandwidth reserved by playing streams.',
+                   [('', admissionStats['reserved_bytes_per_second'])])
+            family('rtsp_rejected_total', 'counter', 'Requests answered with 503, by exceeded limit.',
+                   [(f'{{limit="{reason}"}}', admissionStats[f'rejected_{reason}'])
+                    for reason in ('sessions', 'playing', 'bandwidth')])
+
+        if registry is not None:
+            registryStats = registry.stats()
+            family('rtsp_live_sessions', 'gauge', 'RTSP sessions not yet ended.', [('', registryStats['live'])])
+            family('rtsp_sessions_reclaimed_total', 'counter', 'Ended sessions whose resources were released, by how they ended.',
+                   [(f'{{reason="{reason}"}}', registryStats[f'reclaimed_{reason}']) for reason in registry.REASONS])
+        return '\n'.join(lines) + '\n'
+
+    def serveHttp(self, port, host='127.0.0.1'):
+        """Serve /metrics in Prometheus format from a background thread."""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass    #scrapes every few seconds would flood the console
+
+        self.httpServer = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.httpServer.daemon_threads = True
+        threading.Thread(target=self.httpServer.serve_forever, name='MetricsHTTP', daemon=True).start()
+        return self.httpServer
+
+
+# Process-wide metrics used by ServerWorker
+shared_metrics = ServerMetrics()
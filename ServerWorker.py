@@ -3,9 +3,26 @@ import sys
 import traceback
 import threading
 import socket
+import time
 
-from VideoStream import VideoStream
-from RtpPacket import RtpPacket
+from VideoStream import VideoStream, DEFAULT_FRAME_RATE
+from AdaptiveStream import AdaptiveStream
+from ReadAhead import ReadAheadStream
+from RenditionLadder import load_ladder
+from Thumbnails import load_thumbnails
+from FrameScheduler import shared_scheduler
+from ServerMetrics import SessionMetrics, shared_metrics
+from AdmissionControl import shared_admission
+from SessionRegistry import shared_sessions
+from SharedChannel import ChannelRejected
+from RtspParser import RtspParser, RtspParseError, parseParameters
+from RtpJpeg import DEFAULT_MTU, PACKET_HEADER_SIZE, RtpJpegPacketizer
+
+REJECT_TIMEOUT = 2.0     #seconds a connection over the session cap gets to send the request answered with 503
+MAX_REJECTING = 32       #connections being answered with 503 at once, further ones are closed unanswered
+RETRY_AFTER = 5          #seconds clients over capacity are told to wait
+RTSP_RECV_SIZE = 4096    #bytes read from the RTSP connection at once, requests are framed by RtspParser
+MAX_REQUEST_BODY = 4096  #bytes a request body may have, only SET_PARAMETER feedback carries one
 
 
 class ServerWorker:
@@ -14,6 +31,9 @@ class ServerWorker:
     PAUSE = 'PAUSE'
     TEARDOWN = 'TEARDOWN'
     SCRUB = 'SCRUB'  # Added for scrubbing
+    GET_PARAMETER = 'GET_PARAMETER'   #returns session and server metrics
+    SET_PARAMETER = 'SET_PARAMETER'   #client feedback (loss, fps) driving rendition switches
+    THUMBNAILS = 'THUMBNAILS'         #returns the scrub preview track, empty if the file has none
 
     INIT = 0      #main 3 states 
     READY = 1
@@ -23,32 +43,120 @@ class ServerWorker:
     OK_200 = 0    
     FILE_NOT_FOUND_404 = 1
     CON_ERR_500 = 2
+    UNAVAILABLE_503 = 3    #over a session, stream or bandwidth limit
+    METHOD_NOT_VALID_455 = 4   #request not allowed in the session's current state
+    NOT_IMPLEMENTED_501 = 5    #unknown method
+    ERROR_REPLIES = {
+        FILE_NOT_FOUND_404: '404 Not Found',
+        CON_ERR_500: '500 Internal Server Error',
+        METHOD_NOT_VALID_455: '455 Method Not Valid in This State',
+        NOT_IMPLEMENTED_501: '501 Not Implemented',
+    }
 
     clientInfo = {}   #store client info in this dictionary
 
+    scheduler = shared_scheduler   #paces the frames of every playing session
+    mtu = DEFAULT_MTU      #frames are split into RTP packets that fit this MTU
+    useMmap = False        #serve frames as zero-copy slices of a memory-mapped file
+    progressive = False    #start streaming non-MJPEG files while they are being converted
+    channels = None        #ChannelRegistry when sessions watching the same file share delivery
+    serverMetrics = shared_metrics   #aggregates the metrics of every session
+    admission = shared_admission     #session, playing stream and bandwidth limits
+    rejecting = threading.BoundedSemaphore(MAX_REJECTING)
+    sessionRegistry = shared_sessions   #last activity of every session, reaps idle ones
+    readAhead = 0          #frames a background producer reads ahead of the sender, 0 reads while sending
+    readAheadBlock = True  #on an empty read-ahead ring, wait briefly for the frame being read
+    readAheadPool = None   #shared executor refilling read-ahead rings, None gives each playing stream a thread
+
     def __init__(self, clientInfo):
         self.clientInfo = clientInfo   #for initialization of clientinfo
+        self.packetizer = RtpJpegPacketizer(self.mtu)   #RTP sequence number and reused header buffer
+        self.metrics = SessionMetrics()   #registered with serverMetrics once the session is set up
+        self.admitted = False          #counted against the session cap
+        self.reservedRate = None       #bytes per second reserved while playing
 
     def run(self):
+        self.admitted = self.admission.admitSession()
+        if not self.admitted:
+            self.rejectConnection()
+            return
+        self.sessionRegistry.register(self, self.clientInfo['rtspSocket'][0])
         threading.Thread(target=self.recvRtspRequest).start()  #for each client we create a thread and in that thread for 
                                                             #that particular client rtsp request are receive
 
+    def rejectConnection(self):
+        """Answer the first request of a connection over the session cap with 503 and close it."""
+        connSocket = self.clientInfo['rtspSocket'][0]
+        if not self.rejecting.acquire(blocking=False):
+            connSocket.close()    #already busy turning connections away
+            return
+
+        def reject():
+            try:
+                connSocket.settimeout(REJECT_TIMEOUT)
+                parser = RtspParser(maxBodySize=MAX_REQUEST_BODY)
+                messages = []
+                while not messages:
+                    data = connSocket.recv(RTSP_RECV_SIZE)
+                    if not data:
+                        break
+                    messages = parser.feed(data)
+                for message in messages:
+                    self.replyUnavailable(message)
+            except (OSError, RtspParseError):
+                pass
+            finally:
+                connSocket.close()
+                self.rejecting.release()
+        threading.Thread(target=reject, daemon=True).start()
+
+    def replyUnavailable(self, message):
+        """Send 503 to a request without processing it."""
+        if message.cseq is not None:
+            self.replyRtsp(self.UNAVAILABLE_503, str(message.cseq))
+
     def recvRtspRequest(self):
         """Receive RTSP request from the client."""
         connSocket = self.clientInfo['rtspSocket'][0]
+        parser = RtspParser(maxBodySize=MAX_REQUEST_BODY)    #requests may be split across reads or pipelined in one
         while True:
-            data = connSocket.recv(256)   #in the received rtsp request we are receiving data from client
-            if data:
-                print("Data received:\n" + data.decode("utf-8"))
-                self.processRtspRequest(data.decode("utf-8"))  #after that we are calling processrtsp request
-
-    def processRtspRequest(self, data):
-        """Process RTSP request sent from the client."""
-        request = data.split('\n')
-        line1 = request[0].split(' ')
-        requestType = line1[0]
-        filename = line1[1]
-        seq = request[1].split(' ')
+            try:
+                data = connSocket.recv(RTSP_RECV_SIZE)   #in the received rtsp request we are receiving data from client
+            except OSError:
+                data = b''    #closed by TEARDOWN or the reaper, or a failed keepalive
+            if not data:
+                # Client went away without TEARDOWN, give its place back
+                self.close('disconnected')
+                break
+            print("Data received:\n" + data.decode("utf-8", "replace"))
+            try:
+                messages = parser.feed(data)
+            except RtspParseError as e:
+                print("Malformed RTSP request:", e)
+                self.close('disconnected')
+                break
+            for message in messages:
+                self.handleRequest(message)  #after that we are calling processrtsp request, in order
+
+    def handleRequest(self, message):
+        """Process a request, answering 500 if it fails so the session and its other requests carry on."""
+        try:
+            self.processRtspRequest(message)
+        except Exception:
+            print('-'*60)
+            traceback.print_exc(file=sys.stdout)
+            print('-'*60)
+            try:
+                self.replyRtsp(self.CON_ERR_500, str(message.cseq))
+            except OSError:
+                pass    #connection already gone
+
+    def processRtspRequest(self, message):
+        """Process an RTSP request (an RtspMessage) sent from the client."""
+        self.sessionRegistry.touch(self)
+        requestType = message.method
+        filename = message.uri
+        seq = str(message.cseq)
 
         # Handle SCRUB request
         if requestType == self.SCRUB:
@@ -56,143 +164,331 @@ class ServerWorker:
             if self.state in [self.READY, self.PLAYING]:
                 try:
                     # Extract position from request
-                    position = None
-                    for line in request:
-                        if line.startswith('Position'):
-                            position = float(line.split(':')[1].strip())
-                            break
+                    position = message.header('Position')
                     
                     if position is not None:
+                        position = float(position)
                         # Calculate target frame
                         total_frames = self.clientInfo['videoStream'].get_total_frames()
                         target_frame = int((position / 100.0) * total_frames)
                         
                         # Pause any current playback
                         if self.state == self.PLAYING:
-                            self.clientInfo['event'].set()
-                            if 'worker' in self.clientInfo and self.clientInfo['worker'].is_alive():
-                                self.clientInfo['worker'].join(timeout=1.0)
+                            self.stopRtp()
+                            self.releasePlay()
                         
                         # Set the video stream to the requested frame
+                        self.metrics.count('scrubs')
                         if self.clientInfo['videoStream'].set_frame(target_frame):
-                            self.replyRtsp(self.OK_200, seq[1])
-                            
-                            # Prepare for new playback if needed
-                            self.clientInfo['event'].clear()
+                            self.replyRtsp(self.OK_200, seq)
                             
                             # Update state
                             self.state = self.READY
                         else:
-                            self.replyRtsp(self.CON_ERR_500, seq[1])
+                            self.replyRtsp(self.CON_ERR_500, seq)
                     else:
-                        self.replyRtsp(self.CON_ERR_500, seq[1])
+                        self.replyRtsp(self.CON_ERR_500, seq)
                 except Exception as e:
                     print(f"Error during scrubbing: {e}")
-                    self.replyRtsp(self.CON_ERR_500, seq[1])
+                    self.replyRtsp(self.CON_ERR_500, seq)
             else:
-                self.replyRtsp(self.CON_ERR_500, seq[1])
+                self.replyRtsp(self.METHOD_NOT_VALID_455, seq)
                 
         # Handle other requests (SETUP, PLAY, PAUSE, TEARDOWN)
         elif requestType == self.SETUP:
             if self.state == self.INIT:
                 try:
-                    self.clientInfo['videoStream'] = VideoStream(filename)
+                    renditions = load_ladder(filename)
+                    if renditions:
+                        # Converted with a rendition ladder, start at the best rendition
+                        self.clientInfo['videoStream'] = AdaptiveStream(renditions, use_mmap=self.useMmap)
+                    else:
+                        self.clientInfo['videoStream'] = VideoStream(filename, use_mmap=self.useMmap, progressive=self.progressive)
+                    if self.readAhead and not self.sharedDelivery():    #channels read ahead for their sessions
+                        self.clientInfo['videoStream'] = ReadAheadStream(self.clientInfo['videoStream'], self.readAhead,
+                                                                         self.metrics, self.readAheadBlock,
+                                                                         self.readAheadPool)
                     self.state = self.READY
                     self.clientInfo['session'] = randint(100000, 999999)
-                    self.replyRtsp(self.OK_200, seq[1])
-                    self.clientInfo['rtpPort'] = request[2].split(' ')[3]
+                    transport = parseParameters(message.header('Transport', ''))
+                    self.clientInfo['rtpPort'] = transport.get('client_port', '0').split('-')[0]    #RTP of an RTP-RTCP pair
+                    self.metrics.name = str(self.clientInfo['session'])
+                    self.serverMetrics.add(self.metrics)
+                    self.replyRtsp(self.OK_200, seq)
                 except IOError:
-                    self.replyRtsp(self.FILE_NOT_FOUND_404, seq[1])
+                    self.replyRtsp(self.FILE_NOT_FOUND_404, seq)
+            else:
+                self.replyRtsp(self.METHOD_NOT_VALID_455, seq)
                     
         elif requestType == self.PLAY:
-            if self.state == self.READY:
+            if self.state != self.READY:
+                self.replyRtsp(self.METHOD_NOT_VALID_455, seq)
+            elif not self.admitPlay():
+                self.replyRtsp(self.UNAVAILABLE_503, seq)
+            else:
                 print("processing PLAY\n")
-                self.state = self.PLAYING
-                
-                # Create a new socket for RTP/UDP
-                self.clientInfo["rtpSocket"] = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                
-                self.replyRtsp(self.OK_200, seq[1])
-                
-                # Create a new thread and start sending RTP packets
-                self.clientInfo['event'] = threading.Event()
-                self.clientInfo['worker'] = threading.Thread(target=self.sendRtp)
-                self.clientInfo['worker'].start()
+                try:
+                    self.startReadAhead()
+                    self.startRtp()
+                except ChannelRejected:
+                    self.releasePlay()
+                    self.replyRtsp(self.UNAVAILABLE_503, seq)
+                except IOError:
+                    # A shared channel could not open the source
+                    self.releasePlay()
+                    self.replyRtsp(self.CON_ERR_500, seq)
+                else:
+                    self.state = self.PLAYING
+                    self.replyRtsp(self.OK_200, seq)
                 
         elif requestType == self.PAUSE:
             if self.state == self.PLAYING:
                 print("processing PAUSE\n")
                 self.state = self.READY
-                self.clientInfo['event'].set()
-                self.replyRtsp(self.OK_200, seq[1])
+                self.stopRtp()
+                self.releasePlay()
+                self.replyRtsp(self.OK_200, seq)
+            else:
+                self.replyRtsp(self.METHOD_NOT_VALID_455, seq)
                 
         elif requestType == self.TEARDOWN:
             print("processing TEARDOWN\n")
-            self.clientInfo['event'].set()
-            self.replyRtsp(self.OK_200, seq[1])
-            self.clientInfo['rtpSocket'].close()
-    def sendRtp(self):
-        """Send RTP packets over UDP."""
-        while True:
-            self.clientInfo['event'].wait(0.05)
+            self.stopRtp()
+            self.replyRtsp(self.OK_200, seq)
+            self.close('teardown')
 
-            # Stop sending if request is PAUSE or TEARDOWN
-            if self.clientInfo['event'].isSet():
-                break
+        elif requestType == self.SET_PARAMETER:
+            # Body lines "loss: <fraction>" and "fps: <frames/s>" observed by the client
+            params = {}
+            for line in message.body.decode('utf-8', 'replace').splitlines():
+                name, _, value = line.partition(':')
+                params[name.strip().lower()] = value.strip()
+            videoStream = self.clientInfo.get('videoStream')
+            try:
+                if self.isAdaptive() and 'loss' in params and 'fps' in params:
+                    if videoStream.report(float(params['loss']), float(params['fps'])):
+                        self.metrics.count('rendition_switches')
+                self.replyRtsp(self.OK_200, seq)
+            except (ValueError, OSError):
+                # Malformed feedback, or a rendition that cannot be opened: keep streaming as before
+                self.replyRtsp(self.CON_ERR_500, seq)
+
+        elif requestType == self.GET_PARAMETER:
+            # Monitoring: this session's metrics, then the server-wide totals
+            body = ''.join(f'{key}: {value}\n' for key, value in self.metrics.snapshot().items())
+            body += ''.join(f'server_{key}: {value}\n' for key, value in self.serverMetrics.snapshot().items())
+            body += ''.join(f'admission_{key}: {value}\n' for key, value in self.admission.stats().items())
+            body += ''.join(f'sessions_{key}: {value}\n' for key, value in self.sessionRegistry.stats().items())
+            self.replyRtsp(self.OK_200, seq, body)
 
-            data = self.clientInfo['videoStream'].nextFrame()  #get data using videostream class
-            if data:
-                frameNumber = self.clientInfo['videoStream'].frameNbr()
+        elif requestType == self.THUMBNAILS:
+            # Sent once after SETUP, the client previews scrubbing from it without further requests
+            if self.state == self.INIT:
+                self.replyRtsp(self.METHOD_NOT_VALID_455, seq)
+            else:
                 try:
-                    address = self.clientInfo['rtspSocket'][1][0]   #address and port of client
-                    port = int(self.clientInfo['rtpPort'])          #so that we can send packet to client using it.
-                    self.clientInfo['rtpSocket'].sendto(
-                        self.makeRtp(data, frameNumber), (address, port))    #make rtp will create packet and received packet will send to client using address and port
-                except:
-                    print("Connection Error")
-                    print('-'*60)
-                    traceback.print_exc(file=sys.stdout)
-                    print('-'*60)
+                    thumbnails = load_thumbnails(filename) or b''
+                except OSError:
+                    thumbnails = b''
+                self.replyRtsp(self.OK_200, seq, thumbnails, 'application/octet-stream')
+
+        else:
+            self.replyRtsp(self.NOT_IMPLEMENTED_501, seq)
+
+    def startReadAhead(self):
+        """Start prefetching the session's frames, nothing is read ahead before the first PLAY."""
+        videoStream = self.clientInfo['videoStream']
+        if isinstance(videoStream, ReadAheadStream):
+            videoStream.start()
+
+    def startRtp(self):
+        """Start delivering RTP packets for the current session."""
+        if self.sharedDelivery():
+            # Shared delivery: subscribe to a channel of the same file at this position
+            address = (self.clientInfo['rtspSocket'][1][0], int(self.clientInfo['rtpPort']))
+            self.clientInfo['channel'] = self.channels.join(self, self.clientInfo['videoStream'], address)
+            return
+
+        # Create a new socket for RTP/UDP
+        if 'rtpSocket' not in self.clientInfo:
+            self.clientInfo['rtpSocket'] = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+        # Let the shared scheduler wake this session at each frame deadline
+        self.stopRtp()
+        self.clientInfo['pacer'] = self.scheduler.add(self.sendFrame, 1.0 / self.frameRate())
+
+    def stopRtp(self):
+        """Stop delivering RTP packets and wait for a frame being sent to finish."""
+        channel = self.clientInfo.pop('channel', None)
+        if channel:
+            self.channels.leave(self, channel, self.clientInfo['videoStream'])
+        pacer = self.clientInfo.pop('pacer', None)
+        if pacer:
+            pacer.cancel()
+
+    def admitPlay(self):
+        """Reserve a playing stream and its bit rate, returns False when over capacity."""
+        if self.reservedRate is not None:
+            return True
+        if self.sharedDelivery() and self.channels.multicast:
+            rate = 0.0    #one copy for every viewer, reserved by the multicast channel
+        else:
+            rate = self.clientInfo['videoStream'].byte_rate()
+        if not self.admission.admitPlay(rate):
+            return False
+        self.reservedRate = rate
+        return True
+
+    def releasePlay(self):
+        if self.reservedRate is not None:
+            self.admission.releasePlay(self.reservedRate)
+            self.reservedRate = None
+
+    def releaseAdmission(self):
+        """Return everything the session holds against the server's limits."""
+        self.releasePlay()
+        if self.admitted:
+            self.admission.releaseSession()
+            self.admitted = False
+
+    def isAdaptive(self):
+        """Return True if the session streams a rendition ladder."""
+        videoStream = self.clientInfo.get('videoStream')
+        return isinstance(getattr(videoStream, 'source', videoStream), AdaptiveStream)
+
+    def sharedDelivery(self):
+        """Return True if the session's frames come from a shared channel."""
+        # A channel cannot follow each client's feedback, ladder sessions send their own frames
+        return bool(self.channels) and not self.isAdaptive()
+
+    def closeStream(self):
+        """Close the video file of a session that ended, and its read-ahead producer."""
+        videoStream = self.clientInfo.pop('videoStream', None)
+        if videoStream:
+            videoStream.close()
+
+    def close(self, reason='disconnected'):
+        """End the session: release its stream, sockets, limits and metrics, once.
+
+        reason is how it ended for the session registry: 'teardown',
+        'disconnected' or 'idle'. Closing the RTSP connection also ends the
+        thread receiving its requests.
+        """
+        if not self.sessionRegistry.unregister(self, reason):
+            return
+        self.stopRtp()
+        self.closeStream()
+        self.releaseAdmission()
+        self.serverMetrics.remove(self.metrics)
+        rtpSocket = self.clientInfo.pop('rtpSocket', None)
+        if rtpSocket:
+            rtpSocket.close()
+        self.closeConnection()
+
+    def closeConnection(self):
+        """Close the RTSP connection, waking a recv blocked on it."""
+        connSocket = self.clientInfo['rtspSocket'][0]
+        try:
+            connSocket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass    #already reset by the client
+        connSocket.close()
+
+    def frameRate(self):
+        """Return the frame rate the session is paced at."""
+        videoStream = self.clientInfo.get('videoStream')
+        return videoStream.frame_rate if videoStream else DEFAULT_FRAME_RATE
+
+    def sendFrame(self, skipped=0, lateness=0.0):
+        """Send the frame that is due, skipping frames missed while running late."""
+        self.metrics.late(lateness)
+        if skipped:
+            self.metrics.count('frames_skipped', skipped)
+            videoStream = self.clientInfo['videoStream']
+            videoStream.set_frame(videoStream.frameNbr() + skipped)
+        self.sendNextFrame()
+
+    def sendNextFrame(self):
+        """Read the next frame from the video stream and send it to the client."""
+        start = time.perf_counter()
+        data = self.clientInfo['videoStream'].nextFrame()  #get data using videostream class
+        self.metrics.time('read', time.perf_counter() - start)
+        if data and not self.admission.consume(len(data)):
+            # Over the bandwidth budget: drop this frame rather than delay every stream
+            self.metrics.count('frames_shed')
+        elif data:
+            frameNumber = self.clientInfo['videoStream'].frameNbr()
+            try:
+                address = self.clientInfo['rtspSocket'][1][0]   #address and port of client
+                port = int(self.clientInfo['rtpPort'])          #so that we can send packet to client using it.
+                packets = self.makeRtp(data, frameNumber)
+                start = time.perf_counter()
+                for packet in packets:    #make rtp will create packets and each packet will be sent to client using address and port
+                    self.sendPacket(packet, (address, port))
+                self.metrics.time('send', time.perf_counter() - start)
+                self.metrics.count('frames_sent')
+                self.metrics.count('packets_sent', len(packets))
+                self.metrics.count('bytes_sent', len(data) + len(packets) * PACKET_HEADER_SIZE)
+            except:
+                self.metrics.count('packets_dropped')
+                print("Connection Error")
+                print('-'*60)
+                traceback.print_exc(file=sys.stdout)
+                print('-'*60)
+
+    def sendPacket(self, packet, address):
+        """Send one RTP datagram to the client."""
+        self.clientInfo['rtpSocket'].sendmsg(packet, (), 0, address)
 
     def makeRtp(self, payload, frameNbr):
-        """RTP-packetize the video data."""
-        version = 2
-        padding = 0
-        extension = 0
-        cc = 0
-        marker = 0
-        pt = 26  # MJPEG type
-        seqnum = frameNbr
-        ssrc = 0
-
-        rtpPacket = RtpPacket()   #by RtpPacket() class, create rtp packet which consist rtp header and payload(data)
-
-        max_payload_size = 65507 - 12  # 65507 bytes is the max size for UDP, 12 bytes for RTP header
-        if len(payload) > max_payload_size:
-            payload = payload[:max_payload_size]
-        
-        rtpPacket.encode(version, padding, extension, cc,
-                         seqnum, marker, pt, ssrc, payload)
-
-        return rtpPacket.getPacket()   #return packet
-
-    def replyRtsp(self, code, seq):
+        """RTP-packetize the video data into MTU-sized (headers, fragment) packets."""
+        return self.packetizer.packetize(payload, frameNbr, self.frameRate())
+
+    def replyRtsp(self, code, seq, body=None, contentType='text/parameters'):
         """Send RTSP reply to the client."""      #reply function which will reply clientinfo if 200 Ok else reply an error message
         if code == self.OK_200:
             #print("200 OK")
             reply = 'RTSP/1.0 200 OK\nCSeq: ' + seq + \
-                '\nSession: ' + str(self.clientInfo['session'])
+                '\nSession: ' + str(self.clientInfo.get('session', 0))
             
             # Add total frames information for SETUP
             if 'videoStream' in self.clientInfo:
                 total_frames = self.clientInfo['videoStream'].get_total_frames()
                 reply += '\nTotalFrames: ' + str(total_frames)
-                
-            connSocket = self.clientInfo['rtspSocket'][0]
-            connSocket.send(reply.encode('utf-8'))
-
-        # Error messages
-        elif code == self.FILE_NOT_FOUND_404:
-            print("404 NOT FOUND")
-        elif code == self.CON_ERR_500:
-            print("500 CONNECTION ERROR")
+                reply += '\nFrameRate: ' + str(self.frameRate())
+
+            if self.isAdaptive():
+                reply += '\nRendition: ' + self.clientInfo['videoStream'].rendition()
+
+            # Tell the client where to listen when frames go to a multicast group
+            channel = self.clientInfo.get('channel')
+            if channel and channel.multicast:
+                group, port = channel.multicast
+                reply += f'\nTransport: RTP/UDP;multicast;destination={group};port={port}'
+
+            if body is None:
+                self.sendRtspReply((reply + '\n\n').encode('utf-8'))
+            else:
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                reply += f'\nContent-Type: {contentType}\nContent-Length: {len(body)}\n\n'
+                self.sendRtspReply(reply.encode('utf-8') + body)
+
+        elif code == self.UNAVAILABLE_503:
+            print("503 SERVICE UNAVAILABLE")
+            reply = (f'RTSP/1.0 503 Service Unavailable\nCSeq: {seq}\nSession: {self.clientInfo.get("session", 0)}'
+                     f'\nRetry-After: {RETRY_AFTER}\n\n')
+            self.sendRtspReply(reply.encode('utf-8'))
+
+        # Error messages, answered so clients tracking requests by CSeq see them fail;
+        # they carry the session too, clients ignore replies of other sessions
+        elif code in self.ERROR_REPLIES:
+            status = self.ERROR_REPLIES[code]
+            print(status.upper())
+            reply = f'RTSP/1.0 {status}\nCSeq: {seq}\nSession: {self.clientInfo.get("session", 0)}\n\n'
+            self.sendRtspReply(reply.encode('utf-8'))
+
+    def sendRtspReply(self, reply):
+        """Write an encoded RTSP reply on the control connection."""
+        connSocket = self.clientInfo['rtspSocket'][0]
+        connSocket.sendall(reply)
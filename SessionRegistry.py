@@ -0,0 +1,96 @@
+import socket
+import threading
+import time
+
+DEFAULT_TIMEOUT = 60.0    #seconds without a request before a session that is not playing is reaped
+REAP_INTERVAL = 5.0       #seconds between idle scans
+KEEPALIVE_PROBES = 3      #unanswered TCP keepalive probes before a connection counts as dead
+
+
+class SessionRegistry:
+    """Every live RTSP session with the time of its last request.
+
+    Sessions end in one of three ways: TEARDOWN, the client's connection
+    closing (or its TCP keepalive failing), or the reaper finding it idle
+    for longer than the timeout while not playing. Playing sessions are
+    never idle since the server is busy sending to them. Each session is
+    closed exactly once and counted by how it ended, so a long-running
+    server shows how many sessions it reclaimed instead of leaking them.
+    """
+
+    REASONS = ('teardown', 'disconnected', 'idle')
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.sessions = {}    #session -> monotonic time of its last request
+        self.reclaimed = dict.fromkeys(self.REASONS, 0)
+        self.reaper = None
+
+    def register(self, session, sock=None):
+        """Track a new session, enabling TCP keepalive on its connection to notice vanished clients."""
+        if sock is not None and self.timeout:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                if hasattr(socket, 'TCP_KEEPIDLE'):
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, max(1, int(self.timeout)))
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, int(self.timeout / 4)))
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, KEEPALIVE_PROBES)
+            except OSError:
+                pass
+        with self.lock:
+            self.sessions[session] = time.monotonic()
+
+    def touch(self, session):
+        with self.lock:
+            if session in self.sessions:
+                self.sessions[session] = time.monotonic()
+
+    def unregister(self, session, reason):
+        """Forget a session, returns False if it was already closed."""
+        with self.lock:
+            if self.sessions.pop(session, None) is None:
+                return False
+            self.reclaimed[reason] += 1
+            return True
+
+    def idle(self):
+        """Return the sessions that are not playing and sent no request within the timeout."""
+        deadline = time.monotonic() - self.timeout
+        with self.lock:
+            return [session for session, lastActivity in self.sessions.items()
+                    if lastActivity < deadline and session.state != session.PLAYING]
+
+    def reap(self):
+        """Close idle sessions, returns how many were reclaimed."""
+        sessions = self.idle()
+        if sessions:
+            print(f"Reclaimed {len(sessions)} idle session(s), {len(self.sessions) - len(sessions)} live")
+        for session in sessions:
+            session.close('idle')
+        return len(sessions)
+
+    def start(self, interval=REAP_INTERVAL):
+        """Reap idle sessions from a background thread."""
+        interval = min(interval, self.timeout / 2)    #short timeouts are still honoured closely
+
+        def reapLoop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reap()
+                except Exception as e:
+                    print("Session reaper error:", e)
+        self.reaper = threading.Thread(target=reapLoop, name='SessionReaper', daemon=True)
+        self.reaper.start()
+
+    def stats(self):
+        with self.lock:
+            stats = {'live': len(self.sessions)}
+            for reason, count in self.reclaimed.items():
+                stats[f'reclaimed_{reason}'] = count
+        return stats
+
+
+# Process-wide registry used by ServerWorker, started by Server.py
+shared_sessions = SessionRegistry()
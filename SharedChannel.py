@@ -0,0 +1,182 @@
+import os
+import socket
+import threading
+import time
+
+from ReadAhead import ReadAheadStream
+from RtpJpeg import PACKET_HEADER_SIZE, RtpJpegPacketizer
+from ServerMetrics import SessionMetrics
+
+JOIN_WINDOW = 1.0                 #seconds a session's position may differ from a channel it joins
+MULTICAST_GROUP_BASE = '239.255.42.0'
+MULTICAST_BASE_PORT = 45000
+
+
+class ChannelRejected(Exception):
+    """A new multicast channel would exceed the bandwidth budget."""
+
+
+class SharedChannel:
+    """One paced, packetized stream of a file delivered to every subscribed session.
+
+    Each frame is read and packetized once, then either sent once to an IP
+    multicast group or to each subscriber address in a single fan-out loop.
+    """
+
+    def __init__(self, registry, source, frameNbr, multicast=None):
+        from ServerWorker import ServerWorker    #ServerWorker imports this module
+        self.registry = registry
+        self.source = source.original_filename    #file the sessions asked for, converted or not
+        self.videoStream = source.reopen()
+        self.videoStream.set_frame(frameNbr)
+        self.packetizer = RtpJpegPacketizer(ServerWorker.mtu)
+        self.metrics = SessionMetrics()
+        self.serverMetrics = ServerWorker.serverMetrics
+        self.admission = ServerWorker.admission
+        if ServerWorker.readAhead:
+            self.videoStream = ReadAheadStream(self.videoStream, ServerWorker.readAhead, self.metrics,
+                                               executor=ServerWorker.readAheadPool)
+        self.multicast = multicast    #(group, port) or None for unicast fan-out
+        self.subscribers = {}         #session -> (address, port)
+        self.lock = threading.Lock()
+        self.socket = registry.socket
+        self.pacer = None
+        self.reservedRate = 0.0       #bandwidth a multicast channel reserves for all its viewers
+        self.metrics.name = f'channel:{os.path.basename(self.source)}:{id(self):x}'
+
+    def position(self):
+        return self.videoStream.frameNbr()
+
+    def start(self, scheduler):
+        self.serverMetrics.add(self.metrics)
+        if isinstance(self.videoStream, ReadAheadStream):
+            self.videoStream.start()
+        self.pacer = scheduler.add(self.sendFrame, 1.0 / self.videoStream.frame_rate)
+
+    def stop(self):
+        if self.pacer:
+            self.pacer.cancel(wait=False)
+            self.pacer = None
+        self.videoStream.close()
+        self.serverMetrics.remove(self.metrics)
+        if self.reservedRate:
+            self.admission.release(self.reservedRate)
+            self.reservedRate = 0.0
+
+    def sendFrame(self, skipped=0, lateness=0.0):
+        """Read, packetize and deliver the next frame to every subscriber."""
+        self.metrics.late(lateness)
+        if skipped:
+            self.metrics.count('frames_skipped', skipped)
+            self.videoStream.set_frame(self.videoStream.frameNbr() + skipped)
+        start = time.perf_counter()
+        data = self.videoStream.nextFrame()
+        self.metrics.time('read', time.perf_counter() - start)
+        if not data:
+            return
+        if self.multicast:
+            destinations = [self.multicast]
+        else:
+            with self.lock:
+                destinations = list(self.subscribers.values())
+        if not self.admission.consume(len(data) * len(destinations)):
+            self.metrics.count('frames_shed')
+            return
+        packets = self.packetizer.packetize(data, self.videoStream.frameNbr(), self.videoStream.frame_rate)
+        start = time.perf_counter()
+        for address in destinations:
+            for packet in packets:
+                try:
+                    self.socket.sendmsg(packet, (), 0, address)
+                except OSError as e:
+                    self.metrics.count('packets_dropped')
+                    print(f"Shared channel send error to {address}: {e}")
+        self.metrics.time('send', time.perf_counter() - start)
+        self.metrics.count('frames_sent')
+        self.metrics.count('packets_sent', len(packets) * len(destinations))
+        self.metrics.count('bytes_sent', (len(data) + len(packets) * PACKET_HEADER_SIZE) * len(destinations))
+
+
+class ChannelRegistry:
+    """Groups sessions playing the same file at about the same position into shared channels."""
+
+    def __init__(self, scheduler, multicast=False, interface='0.0.0.0', ttl=1):
+        self.scheduler = scheduler
+        self.multicast = multicast
+        self.channels = {}    #source file -> list of channels
+        self.lock = threading.Lock()
+        self.nextGroup = 0
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if multicast:
+            self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+            self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+
+    def allocateGroup(self):
+        """Return a (group, port) pair for a new multicast channel."""
+        n = self.nextGroup
+        self.nextGroup += 1
+        base = socket.inet_aton(MULTICAST_GROUP_BASE)
+        group = socket.inet_ntoa(base[:3] + bytes([n % 254 + 1]))
+        return group, MULTICAST_BASE_PORT + 2 * (n % 1000)
+
+    def join(self, session, videoStream, address):
+        """Subscribe a session at its current position, returns the channel.
+
+        videoStream is the session's VideoStream; a new channel reopens its
+        source rather than its file, which may be a conversion's temporary output.
+        """
+        source = videoStream.original_filename
+        position = videoStream.frameNbr()
+        window = JOIN_WINDOW * videoStream.frame_rate
+        with self.lock:
+            for channel in self.channels.get(source, []):
+                if abs(channel.position() - position) <= window:
+                    break
+            else:
+                channel = self.openChannel(videoStream, position)
+                self.channels.setdefault(source, []).append(channel)
+                channel.start(self.scheduler)
+            with channel.lock:
+                channel.subscribers[session] = address
+        return channel
+
+    def openChannel(self, videoStream, position):
+        """Create a channel at position, a multicast one reserving its single copy's bandwidth."""
+        if not self.multicast:
+            return SharedChannel(self, videoStream, position)    #viewers reserve their own copies
+        from ServerWorker import ServerWorker
+        rate = videoStream.byte_rate()
+        if not ServerWorker.admission.reserve(rate):
+            raise ChannelRejected(f"no bandwidth for a channel of {videoStream.original_filename}")
+        try:
+            channel = SharedChannel(self, videoStream, position, self.allocateGroup())
+        except Exception:
+            ServerWorker.admission.release(rate)
+            raise
+        channel.reservedRate = rate
+        return channel
+
+    def leave(self, session, channel, videoStream=None):
+        """Unsubscribe a session, carrying the channel's position back to its own stream."""
+        with self.lock:
+            with channel.lock:
+                channel.subscribers.pop(session, None)
+                empty = not channel.subscribers
+            if videoStream is not None:
+                videoStream.set_frame(channel.position())
+            if empty:
+                channel.stop()
+                channels = self.channels.get(channel.source, [])
+                if channel in channels:
+                    channels.remove(channel)
+                if not channels:
+                    self.channels.pop(channel.source, None)
+
+    def stats(self):
+        with self.lock:
+            channels = [c for group in self.channels.values() for c in group]
+            return {
+                'channels': len(channels),
+                'subscribers': sum(len(c.subscribers) for c in channels),
+            }
@@ -0,0 +1,145 @@
+import os
+import sys
+import argparse
+import struct
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+from FrameIndex import MJPEG_EXTS, load_index, scan_frame_positions, read_frame_rate
+
+# Sidecar layout: header followed by each thumbnail as a uint32 length and its JPEG bytes
+#   magic, version, source file size, source mtime (ns), video frames per thumbnail,
+#   number of thumbnails
+THUMB_HEADER = struct.Struct('<4sH2xQqII')
+THUMB_LENGTH = struct.Struct('<I')
+THUMB_MAGIC = b'THMB'
+THUMB_VERSION = 1
+THUMB_EXT = '.thumbs'
+
+DEFAULT_INTERVAL = 2.0           # seconds of video between thumbnails
+DEFAULT_SIZE = (160, 90)
+DEFAULT_FRAME_RATE = 20.0        # used when the frame index records no rate
+THUMB_QUALITY = 70
+
+
+def thumbnails_path(video_file: str) -> str:
+    """Returns the thumbnail track path for a video file"""
+    return video_file + THUMB_EXT
+
+
+def build_thumbnails(video_file: str, interval: float = DEFAULT_INTERVAL, size: Tuple[int, int] = DEFAULT_SIZE,
+                     frame_rate: Optional[float] = None, force: bool = False) -> Optional[int]:
+    """
+    Writes a low-resolution JPEG of every interval seconds of an MJPEG video
+    Returns: the number of thumbnails, or None if the track was already current
+    """
+    from PIL import Image    # only needed to build tracks, not to serve them
+
+    stat = os.stat(video_file)
+    if not force and load_thumbnails(video_file, stat) is not None:
+        return None
+
+    index = load_index(video_file, stat)
+    with open(video_file, 'rb') as f:
+        positions = index[0] if index else scan_frame_positions(f)
+        frame_rate = frame_rate or (index[1] if index else read_frame_rate(video_file)) or DEFAULT_FRAME_RATE
+        step = max(1, round(interval * frame_rate))
+
+        thumbs = []
+        for frame in range(0, len(positions) - 1, step):
+            start = positions[frame] + 5    # skip 5-byte size header
+            f.seek(start)
+            image = Image.open(BytesIO(f.read(positions[frame + 1] - start)))
+            # Decode at 1/2, 1/4 or 1/8 scale, the thumbnail never needs full resolution
+            image.draft('RGB', size)
+            image = image.convert('RGB')
+            image.thumbnail(size, Image.BILINEAR)
+            out = BytesIO()
+            image.save(out, 'JPEG', quality=THUMB_QUALITY)
+            thumbs.append(out.getvalue())
+
+    path = thumbnails_path(video_file)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(THUMB_HEADER.pack(THUMB_MAGIC, THUMB_VERSION, stat.st_size, stat.st_mtime_ns, step, len(thumbs)))
+        for thumb in thumbs:
+            f.write(THUMB_LENGTH.pack(len(thumb)))
+            f.write(thumb)
+    os.replace(temp_path, path)
+    return len(thumbs)
+
+
+def load_thumbnails(video_file: str, stat: Optional[os.stat_result] = None) -> Optional[bytes]:
+    """
+    Reads the thumbnail track if it matches the video's size and mtime
+    Returns: the raw track, as sent to clients, None if there is no valid track
+    """
+    if stat is None:
+        stat = os.stat(video_file)
+    try:
+        with open(thumbnails_path(video_file), 'rb') as f:
+            data = f.read()
+        magic, version, size, mtime_ns, _, _ = THUMB_HEADER.unpack_from(data)
+    except (OSError, struct.error):
+        return None
+    if (magic != THUMB_MAGIC or version != THUMB_VERSION or size != stat.st_size
+            or mtime_ns != stat.st_mtime_ns):
+        return None
+    return data
+
+
+def parse_thumbnails(data: bytes) -> Optional[Tuple[int, List[bytes]]]:
+    """
+    Splits a raw thumbnail track
+    Returns: (video frames per thumbnail, JPEG of each thumbnail), None if the track is invalid
+    """
+    try:
+        magic, version, _, _, step, count = THUMB_HEADER.unpack_from(data)
+        if magic != THUMB_MAGIC or version != THUMB_VERSION:
+            return None
+        view = memoryview(data)
+        pos = THUMB_HEADER.size
+        thumbs = []
+        for _ in range(count):
+            length, = THUMB_LENGTH.unpack_from(data, pos)
+            pos += THUMB_LENGTH.size
+            thumbs.append(bytes(view[pos:pos + length]))
+            pos += length
+        return step, thumbs
+    except struct.error:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build scrub preview thumbnail tracks for MJPEG files')
+    parser.add_argument('paths', nargs='+', help='media directories or MJPEG files')
+    parser.add_argument('-f', '--force', action='store_true', help='rebuild tracks that are already current')
+    parser.add_argument('-n', '--interval', type=float, default=DEFAULT_INTERVAL,
+                        help='seconds of video between thumbnails')
+    args = parser.parse_args()
+
+    videos = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.extend(os.path.join(root, name) for name in sorted(files)
+                              if name.lower().endswith(MJPEG_EXTS))
+        else:
+            videos.append(path)
+
+    built = current = failed = 0
+    for video in videos:
+        try:
+            thumbs = build_thumbnails(video, args.interval, force=args.force)
+        except Exception as e:
+            print(f"Failed: {video}: {e}")
+            failed += 1
+            continue
+        if thumbs is None:
+            current += 1
+        else:
+            built += 1
+            print(f"Thumbnails for {video}: {thumbs}")
+
+    print(f"Built {built}, already current {current}, failed {failed}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from array import array
+from typing import Optional, Union
+
+from VideoConverter import VideoConverter
+from FrameIndex import INDEX_EXT, save_index, build_index
+
+CACHE_EXT = '.mjpg'
+
+
+class TranscodeJob:
+    """A conversion in flight whose frames can be read while ffmpeg is still running."""
+
+    def __init__(self, path: str):
+        self.path = path                      # temp file until done, then the cache entry
+        self.frame_positions = array('Q', [0])
+        self.expected_frames = 0              # estimate from the source duration, 0 if unknown
+        self.frame_rate = 0.0                 # source frame rate, 0 if unknown
+        self.done = False
+        self.succeeded = False
+        self.condition = threading.Condition()
+
+    def add_frame(self, end_pos: int):
+        """Records a frame written to the output, ending at end_pos"""
+        with self.condition:
+            self.frame_positions.append(end_pos)
+            self.condition.notify_all()
+
+    def finish(self, path: Optional[str]):
+        with self.condition:
+            self.done = True
+            self.succeeded = path is not None
+            if path:
+                self.path = path
+            self.condition.notify_all()
+
+    def wait(self, frames: Optional[int] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until the job is done or, if given, has more than `frames` frames
+        Returns: True if the condition was met before the timeout
+        """
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: self.done or (frames is not None and len(self.frame_positions) - 1 > frames),
+                timeout)
+
+
+class TranscodeCache:
+    """Persistent cache of converted videos keyed by source content and ffmpeg params.
+
+    Concurrent requests for the same entry share one in-flight conversion,
+    the cache directory is kept under a disk budget by evicting least
+    recently used entries.
+    """
+
+    def __init__(self, cache_dir: str = 'transcode_cache', max_bytes: int = 10 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.inflight = {}         # cache key -> Event set when its conversion finishes
+        self.source_hashes = {}    # (path, size, mtime_ns) -> content hash
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _source_hash(self, input_file: str) -> str:
+        """Hashes the source contents, memoized per file version"""
+        stat = os.stat(input_file)
+        version = (os.path.abspath(input_file), stat.st_size, stat.st_mtime_ns)
+        digest = self.source_hashes.get(version)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(input_file, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    h.update(chunk)
+            digest = self.source_hashes[version] = h.hexdigest()
+        return digest
+
+    def cache_key(self, input_file: str, converter: VideoConverter) -> str:
+        params = json.dumps(converter.ffmpeg_params, sort_keys=True)
+        return hashlib.sha256(f"{self._source_hash(input_file)}:{params}".encode()).hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_EXT)
+
+    def get(self, input_file: str, converter: Optional[VideoConverter] = None) -> Optional[str]:
+        """
+        Returns the path of the converted video, converting it if needed
+        Returns None if the conversion failed
+        """
+        return self.open(input_file, converter, progressive=False)
+
+    def open(self, input_file: str, converter: Optional[VideoConverter] = None,
+             progressive: bool = False) -> Union[str, TranscodeJob, None]:
+        """
+        Returns the path of the converted video if it is cached. Otherwise
+        converts it, or joins the conversion already in flight; in progressive
+        mode the running TranscodeJob is returned right away so its frames can
+        be read as they are produced.
+        Returns None if the conversion failed
+        """
+        converter = converter or VideoConverter()
+        if not os.path.exists(input_file):
+            print(f"Input file not found: {input_file}")
+            return None
+        key = self.cache_key(input_file, converter)
+        path = self.entry_path(key)
+
+        with self.lock:
+            if os.path.exists(path):
+                self.hits += 1
+                self._touch(path)
+                return path
+            job = self.inflight.get(key)
+            leader = job is None
+            if leader:
+                self.misses += 1
+                job = self.inflight[key] = TranscodeJob(
+                    f"{path}.{os.getpid()}.{threading.get_ident()}.tmp{CACHE_EXT}")
+            else:
+                self.hits += 1
+
+        if progressive:
+            if leader:
+                threading.Thread(target=self._convert, daemon=True,
+                                 args=(key, input_file, converter, job, True)).start()
+            return job
+
+        # Another session may be converting the same source, wait for it
+        if leader:
+            self._convert(key, input_file, converter, job, False)
+        job.wait()
+        return job.path if job.succeeded else None
+
+    def _convert(self, key: str, input_file: str, converter: VideoConverter,
+                 job: TranscodeJob, progressive: bool):
+        """Runs the conversion of an in-flight job and publishes it in the cache"""
+        path = self.entry_path(key)
+        temp_path = job.path
+        result = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            info = converter.probe_video(input_file)
+            if info:
+                job.expected_frames = int(info['duration'] * info['frame_rate'])
+                job.frame_rate = info['frame_rate']
+            if progressive:
+                converted = converter.stream_video(input_file, temp_path, job.add_frame)
+            else:
+                converted = converter.convert_video(input_file, temp_path)
+            if converted:
+                # Rename under the job's lock so sessions never open a stale path
+                with job.condition:
+                    os.replace(temp_path, path)
+                    job.path = path
+                if progressive:
+                    save_index(path, job.frame_positions, frame_rate=job.frame_rate)
+                else:
+                    build_index(path, force=True, frame_rate=job.frame_rate)
+                self.evict(keep=path)
+                result = path
+        except Exception as e:
+            print(f"Transcode error: {e}")
+        finally:
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            with self.lock:
+                del self.inflight[key]
+            job.finish(result)
+
+    def _touch(self, path: str):
+        """Records a use in the access time, leaving mtime for the frame index"""
+        try:
+            st = os.stat(path)
+            os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+        except OSError:
+            pass
+
+    def evict(self, keep: Optional[str] = None):
+        """Removes least recently used entries until the cache fits its budget"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(CACHE_EXT) or '.tmp' in name:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            size = st.st_size
+            if os.path.exists(path + INDEX_EXT):
+                size += os.path.getsize(path + INDEX_EXT)
+            entries.append((st.st_atime_ns, path, size))
+            total += size
+
+        entries.sort()
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            # Open streams keep reading the unlinked file until they close it
+            for victim in (path, path + INDEX_EXT):
+                try:
+                    os.remove(victim)
+                except OSError:
+                    pass
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'inflight': len(self.inflight),
+        }
+
+
+# Process-wide cache used by VideoStream for non-MJPEG sources
+shared_transcodes = TranscodeCache()
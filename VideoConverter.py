@@ -2,8 +2,21 @@ import subprocess
 import os
 import sys
 import argparse
+import tempfile
+import json
+import time
+import contextlib
+import concurrent.futures
 from datetime import datetime, timezone
-from typing import Optional, List, Tuple
+from typing import Callable, Optional, List, Tuple
+
+from FrameIndex import build_index
+from RenditionLadder import DEFAULT_LADDER, LADDER_EXT, rendition_path, save_ladder
+from Thumbnails import THUMB_EXT, build_thumbnails
+
+# Frames are prefixed with their size in 5 ASCII digits
+FRAME_SIZE_DIGITS = 5
+MAX_FRAME_SIZE = 10 ** FRAME_SIZE_DIGITS - 1
 
 class VideoConverter:
     def __init__(self):
@@ -16,9 +29,15 @@ class VideoConverter:
             'flags': 'bicubic'
         }
         
-    def _create_ffmpeg_command(self, input_file: str, output_file: str) -> List[str]:
-        """Creates FFmpeg command with current parameters"""
+    def _create_ffmpeg_command(self, input_file: str, output_file: str,
+                               start: Optional[float] = None, duration: Optional[float] = None) -> List[str]:
+        """Creates FFmpeg command with current parameters, optionally for a time segment"""
         current_time = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        segment = []
+        if start is not None:
+            segment += ['-ss', f'{start:.3f}']
+        if duration is not None:
+            segment += ['-t', f'{duration:.3f}']
         
         return [
             'ffmpeg',
@@ -26,6 +45,7 @@ class VideoConverter:
             '-hide_banner',
             '-threads', self.ffmpeg_params['threads'],
             '-hwaccel', 'none',
+            *segment,
             '-i', input_file,
             '-c:v', 'mjpeg',
             '-b:v', self.ffmpeg_params['bitrate'],
@@ -35,14 +55,16 @@ class VideoConverter:
             '-pix_fmt', self.ffmpeg_params['pixel_format'],
             '-sws_flags', self.ffmpeg_params['flags'],
             '-metadata', f'creation_time={current_time}',
+            '-f', 'mjpeg',
             '-y',
             output_file
         ]
 
-    def _convert_to_mjpeg(self, input_file: str, output_file: str) -> bool:
+    def _convert_to_mjpeg(self, input_file: str, output_file: str,
+                          start: Optional[float] = None, duration: Optional[float] = None) -> bool:
         """Converts input video to MJPEG format"""
         try:
-            cmd = self._create_ffmpeg_command(input_file, output_file)
+            cmd = self._create_ffmpeg_command(input_file, output_file, start, duration)
             process = subprocess.run(cmd, check=True, capture_output=True)
             return True
         except subprocess.CalledProcessError as e:
@@ -52,10 +74,72 @@ class VideoConverter:
             print(f"Conversion error: {e}")
             return False
 
+    def probe_video(self, input_file: str) -> Optional[dict]:
+        """
+        Reads duration (seconds) and frame rate of the first video stream with ffprobe
+        Returns: dict with 'duration' and 'frame_rate', None if probing failed
+        """
+        cmd = [
+            'ffprobe', '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'stream=avg_frame_rate:format=duration',
+            '-of', 'json',
+            input_file
+        ]
+        try:
+            process = subprocess.run(cmd, check=True, capture_output=True)
+            info = json.loads(process.stdout)
+            num, _, den = info['streams'][0]['avg_frame_rate'].partition('/')
+            frame_rate = float(num) / float(den or 1) if float(den or 1) else 0.0
+            return {
+                'duration': float(info['format']['duration']),
+                'frame_rate': frame_rate,
+            }
+        except Exception as e:
+            print(f"Probe error: {e}")
+            return None
+
     def _prefix_with_zeroes(self, s: str, n: int) -> str:
         """Adds leading zeros to string"""
         return '0' * (n - len(s)) + s
 
+    def _extract_frames(self, buffer: bytearray, start: int = 0) -> Tuple[List[Tuple[int, int]], int]:
+        """
+        Finds complete JPEG frames (FF D8 ... FF D9) in buffer[start:]
+        Returns: (start, end) offsets of the frames found and the offset
+        where scanning should resume once more data has been appended
+        """
+        frames = []
+        pos = start
+        find = buffer.find
+
+        while True:
+            soi = find(b'\xff\xd8', pos)
+            if soi < 0:
+                # Keep a trailing 0xFF, it may start a marker split across chunks
+                pos = max(pos, len(buffer) - 1)
+                break
+            eoi = find(b'\xff\xd9', soi + 2)
+            if eoi < 0:
+                # Incomplete frame, wait for the rest of it
+                pos = soi
+                break
+            frames.append((soi, eoi + 2))
+            pos = eoi + 2
+
+        return frames, pos
+
+    def _write_frame(self, out_f, frame_data) -> int:
+        """Writes one frame with its 5-byte size header, returns bytes written"""
+        if len(frame_data) > MAX_FRAME_SIZE:
+            # A longer size would shift every later frame, no reader could parse the file
+            raise ValueError(f"Frame of {len(frame_data)} bytes does not fit the {FRAME_SIZE_DIGITS}-digit size "
+                             f"header, lower the resolution or quality")
+        size_str = self._prefix_with_zeroes(str(len(frame_data)), FRAME_SIZE_DIGITS)
+        out_f.write(size_str.encode())
+        out_f.write(frame_data)
+        return len(size_str) + len(frame_data)
+
     def _process_mjpeg(self, input_file: str, output_file: str, 
                       chunk_size: int = 10 * 1024 * 1024) -> Tuple[bool, int]:
         """Processes MJPEG file into final format"""
@@ -71,29 +155,16 @@ class VideoConverter:
                         break
 
                     buffer.extend(chunk)
-                    pos = 0
-
-                    while pos < len(buffer) - 1:
-                        if buffer[pos] == 0xFF and buffer[pos + 1] == 0xD8:
-                            end_pos = pos + 2
-                            while end_pos < len(buffer) - 1:
-                                if buffer[end_pos] == 0xFF and buffer[end_pos + 1] == 0xD9:
-                                    frame_data = buffer[pos:end_pos + 2]
-                                    size_str = self._prefix_with_zeroes(str(len(frame_data)), 5)
-                                    out_f.write(size_str.encode())
-                                    out_f.write(frame_data)
-                                    total_bytes += len(size_str) + len(frame_data)
-                                    frames_processed += 1
-                                    print(f"\rProcessed frames: {frames_processed}", end='')
-                                    pos = end_pos + 2
-                                    break
-                                end_pos += 1
-                            else:
-                                break
-                        else:
-                            pos += 1
-
-                    buffer = buffer[pos:]
+                    frames, pos = self._extract_frames(buffer)
+                    with memoryview(buffer) as view:
+                        for start, end in frames:
+                            total_bytes += self._write_frame(out_f, view[start:end])
+                            frames_processed += 1
+                    if frames:
+                        print(f"\rProcessed frames: {frames_processed}", end='')
+
+                    # Drop consumed bytes in place, only the unfinished tail is kept
+                    del buffer[:pos]
 
                 print("\nConversion complete!")
                 return True, frames_processed
@@ -101,22 +172,80 @@ class VideoConverter:
             print(f"Processing error: {e}")
             return False, 0
 
-    def convert_video(self, input_file: str, output_file: str) -> Optional[str]:
+    def stream_video(self, input_file: str, output_file: str,
+                     on_frame: Optional[Callable[[int], None]] = None,
+                     chunk_size: int = 64 * 1024) -> Optional[str]:
+        """
+        Converts input video to custom MJPG format, piping ffmpeg's output
+        straight into the framer so frames are usable while ffmpeg runs.
+        on_frame is called with the file offset just past each written frame.
+        Returns: Path to output file on success, None on failure
+        """
+        if not os.path.exists(input_file):
+            print(f"Input file not found: {input_file}")
+            return None
+
+        cmd = self._create_ffmpeg_command(input_file, 'pipe:1')
+        try:
+            with tempfile.TemporaryFile() as err_f, open(output_file, 'wb') as out_f:
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err_f)
+                buffer = bytearray()
+                total_bytes = 0
+                try:
+                    while True:
+                        chunk = process.stdout.read1(chunk_size)
+                        if not chunk:
+                            break
+
+                        buffer.extend(chunk)
+                        frames, pos = self._extract_frames(buffer)
+                        with memoryview(buffer) as view:
+                            for start, end in frames:
+                                total_bytes += self._write_frame(out_f, view[start:end])
+                                # Make the frame visible to readers before announcing it
+                                out_f.flush()
+                                if on_frame:
+                                    on_frame(total_bytes)
+                        del buffer[:pos]
+                finally:
+                    process.stdout.close()
+                    returncode = process.wait()
+
+                if returncode != 0:
+                    err_f.seek(0)
+                    print(f"FFmpeg conversion error: {err_f.read().decode(errors='replace')}")
+                    return None
+                return output_file
+        except Exception as e:
+            print(f"Conversion error: {e}")
+            return None
+
+    def convert_video(self, input_file: str, output_file: str,
+                      start: Optional[float] = None, duration: Optional[float] = None,
+                      convert_only: bool = False) -> Optional[str]:
         """
-        Converts input video to custom MJPG format
+        Converts input video (or the segment starting at start seconds and
+        lasting duration seconds) to custom MJPG format. With convert_only the
+        plain ffmpeg MJPEG output is kept without reframing.
         Returns: Path to output file on success, None on failure
         """
         if not os.path.exists(input_file):
             print(f"Input file not found: {input_file}")
             return None
 
-        # Create intermediate file
-        intermediate_file = f"{input_file}_temp.mjpeg"
+        if convert_only:
+            print("Converting to MJPEG format...")
+            if self._convert_to_mjpeg(input_file, output_file, start, duration):
+                return output_file
+            return None
+
+        # Create intermediate file next to the output so concurrent conversions don't collide
+        intermediate_file = f"{output_file}_temp.mjpeg"
         
         try:
             # Convert to MJPEG
             print("Converting to MJPEG format...")
-            if not self._convert_to_mjpeg(input_file, intermediate_file):
+            if not self._convert_to_mjpeg(input_file, intermediate_file, start, duration):
                 return None
 
             # Process MJPEG to final format
@@ -136,6 +265,31 @@ class VideoConverter:
                 except:
                     pass
 
+    def rendition_params(self, rendition: dict) -> dict:
+        """Returns the ffmpeg parameters of one rendition of a ladder"""
+        return dict(self.ffmpeg_params, scale=rendition['scale'], bitrate=rendition['bitrate'])
+
+    def convert_ladder(self, input_file: str, output_file: str, ladder: List[dict] = DEFAULT_LADDER,
+                       convert_only: bool = False) -> Optional[str]:
+        """
+        Converts input video once per rendition of the ladder. The best
+        rendition is written to output_file, the others next to it with a
+        _<name> suffix, and a manifest lets the server switch between them.
+        Returns: Path to the best rendition on success, None on failure
+        """
+        params = self.ffmpeg_params
+        try:
+            for n, rendition in enumerate(ladder):
+                self.ffmpeg_params = self.rendition_params(rendition)
+                path = rendition_path(output_file, rendition['name'], top=n == 0)
+                print(f"Rendition {rendition['name']}: {rendition['scale']} at {rendition['bitrate']}")
+                if not self.convert_video(input_file, path, convert_only=convert_only):
+                    return None
+        finally:
+            self.ffmpeg_params = params
+        save_ladder(output_file, ladder)
+        return output_file
+
     def set_parameter(self, param: str, value: str) -> bool:
         """Updates conversion parameters"""
         if param in self.ffmpeg_params:
@@ -148,28 +302,285 @@ class VideoConverter:
         return self.ffmpeg_params.get(param)
 
 
+def _convert_task(ffmpeg_params: dict, input_file: str, output_file: str,
+                  start: Optional[float], duration: Optional[float], convert_only: bool) -> bool:
+    """Process pool entry point converting one file or segment"""
+    converter = VideoConverter()
+    converter.ffmpeg_params.update(ffmpeg_params)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return converter.convert_video(input_file, output_file, start, duration, convert_only) is not None
+
+
+class BatchConverter:
+    """Converts many videos concurrently with a bounded process pool.
+
+    Long inputs can be split into time segments that convert in parallel and
+    are concatenated afterwards, which works because the custom MJPG format
+    is a plain sequence of size-prefixed frames. Finished files are recorded
+    in a state file so an interrupted batch resumes where it stopped.
+    """
+
+    STATE_FILE = '.convert_state.json'
+
+    def __init__(self, converter: VideoConverter, output_dir: str, jobs: Optional[int] = None,
+                 segment_seconds: Optional[float] = None, convert_only: bool = False,
+                 ladder: Optional[List[dict]] = None, thumbnails: bool = False):
+        self.converter = converter
+        self.ladder = ladder    # convert every input once per rendition
+        self.thumbnails = thumbnails    # build a scrub preview track of every output
+        self.output_dir = output_dir
+        self.jobs = jobs or os.cpu_count() or 1
+        self.segment_seconds = segment_seconds
+        self.convert_only = convert_only
+        self.state_path = os.path.join(output_dir, self.STATE_FILE)
+        self.state = {}
+
+    @staticmethod
+    def collect_inputs(source: str, output_dir: str) -> List[Tuple[str, str]]:
+        """
+        Lists (input, output) pairs from a directory, or from a manifest with
+        one input per line, optionally followed by a tab and its output path
+        """
+        pairs = []
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                for name in sorted(files):
+                    if name.startswith('.') or name.lower().endswith(('.mjpg', '.mjpeg', '.idx', LADDER_EXT, THUMB_EXT)):
+                        continue
+                    input_file = os.path.join(root, name)
+                    rel = os.path.splitext(os.path.relpath(input_file, source))[0]
+                    pairs.append((input_file, os.path.join(output_dir, rel + '.mjpg')))
+        else:
+            base = os.path.dirname(os.path.abspath(source))
+            with open(source) as f:
+                for line in f:
+                    line = line.rstrip('\n')
+                    if not line.strip() or line.startswith('#'):
+                        continue
+                    input_file, _, output_file = line.partition('\t')
+                    input_file = os.path.join(base, input_file.strip())
+                    if not output_file:
+                        name = os.path.splitext(os.path.basename(input_file))[0]
+                        output_file = os.path.join(output_dir, name + '.mjpg')
+                    pairs.append((input_file, output_file.strip()))
+        return pairs
+
+    def _expand(self, pairs: List[Tuple[str, str]]) -> List[Tuple[str, str, dict, str]]:
+        """Lists (input, output, ffmpeg params, ladder output) jobs, one per rendition with a ladder"""
+        if not self.ladder:
+            return [(i, o, self.converter.ffmpeg_params, o) for i, o in pairs]
+        return [(i, rendition_path(o, rendition['name'], top=n == 0),
+                 self.converter.rendition_params(rendition), o)
+                for i, o in pairs for n, rendition in enumerate(self.ladder)]
+
+    def _fingerprint(self, input_file: str, params: dict) -> dict:
+        stat = os.stat(input_file)
+        return {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'params': params,
+            'convert_only': self.convert_only,
+        }
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+
+    def _save_state(self):
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.state, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.state_path)
+
+    def _is_done(self, input_file: str, output_file: str, params: dict) -> bool:
+        entry = self.state.get(os.path.abspath(output_file))
+        return (entry is not None and os.path.exists(output_file)
+                and entry.get('source') == os.path.abspath(input_file)
+                and entry.get('fingerprint') == self._fingerprint(input_file, params))
+
+    def _segments(self, input_file: str) -> List[Tuple[Optional[float], Optional[float]]]:
+        """Splits an input into (start, duration) segments, or one whole-file job"""
+        if not self.segment_seconds:
+            return [(None, None)]
+        info = self.converter.probe_video(input_file)
+        if not info or info['duration'] <= self.segment_seconds:
+            return [(None, None)]
+        segments = []
+        start = 0.0
+        while start < info['duration']:
+            segments.append((start, self.segment_seconds))
+            start += self.segment_seconds
+        return segments
+
+    def _stitch(self, parts: List[str], output_file: str):
+        """Concatenates converted segments in order"""
+        temp_path = output_file + '.stitch'
+        with open(temp_path, 'wb') as out_f:
+            for part in parts:
+                with open(part, 'rb') as in_f:
+                    while True:
+                        chunk = in_f.read(8 * 1024 * 1024)
+                        if not chunk:
+                            break
+                        out_f.write(chunk)
+        os.replace(temp_path, output_file)
+
+    def run(self, pairs: List[Tuple[str, str]]) -> bool:
+        """Converts all pairs, returns True if every file succeeded"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._load_state()
+        started = time.perf_counter()
+
+        jobs = self._expand(pairs)
+        todo = [job for job in jobs if not self._is_done(*job[:3])]
+        skipped = len(jobs) - len(todo)
+        # Ladder manifests are written once every rendition of their input is converted
+        ladders = {}
+        for _, _, _, ladder_output in todo:
+            ladders[ladder_output] = ladders.get(ladder_output, 0) + 1
+        if skipped:
+            print(f"Skipping {skipped} already converted file(s)")
+
+        done = failed = 0
+        input_bytes = output_bytes = frames = 0
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs) as pool:
+            # Submit every segment of every file, stitching each file once its parts finish
+            remaining = {}
+            futures = {}
+            for input_file, output_file, params, ladder_output in todo:
+                os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+                segments = self._segments(input_file)
+                if len(segments) == 1:
+                    parts = [output_file]
+                else:
+                    parts = [f"{output_file}.part{n:04d}" for n in range(len(segments))]
+                remaining[output_file] = [input_file, parts, len(parts), True, params, ladder_output]
+                for part, (start, duration) in zip(parts, segments):
+                    future = pool.submit(_convert_task, params, input_file,
+                                         part, start, duration, self.convert_only)
+                    futures[future] = output_file
+
+            for future in concurrent.futures.as_completed(futures):
+                output_file = futures[future]
+                entry = remaining[output_file]
+                try:
+                    entry[3] = future.result() and entry[3]
+                except Exception as e:
+                    print(f"Worker error: {e}")
+                    entry[3] = False
+                entry[2] -= 1
+                if entry[2]:
+                    continue
+
+                input_file, parts, _, ok, params, ladder_output = entry
+                if ok and len(parts) > 1:
+                    self._stitch(parts, output_file)
+                for part in parts:
+                    if part != output_file and os.path.exists(part):
+                        os.remove(part)
+
+                if ok:
+                    done += 1
+                    input_bytes += os.path.getsize(input_file)
+                    output_bytes += os.path.getsize(output_file)
+                    file_frames = None
+                    if not self.convert_only:
+                        # Record the source frame rate so the server paces it correctly
+                        info = self.converter.probe_video(input_file)
+                        file_frames = build_index(output_file, force=True,
+                                                  frame_rate=info['frame_rate'] if info else 0.0)
+                        # Clients request the top rendition, so only it needs previews
+                        if self.thumbnails and output_file == ladder_output:
+                            try:
+                                build_thumbnails(output_file, force=True)
+                            except Exception as e:
+                                print(f"Thumbnail error: {output_file}: {e}")
+                    frames += file_frames or 0
+                    self.state[os.path.abspath(output_file)] = {
+                        'source': os.path.abspath(input_file),
+                        'fingerprint': self._fingerprint(input_file, params),
+                    }
+                    self._save_state()
+                    if self.ladder:
+                        ladders[ladder_output] -= 1
+                        if not ladders[ladder_output]:
+                            save_ladder(ladder_output, self.ladder)
+                    detail = f"{file_frames} frames" if file_frames is not None else "converted"
+                    status = f"{input_file} -> {output_file} ({detail}, {len(parts)} segment(s))"
+                else:
+                    failed += 1
+                    status = f"FAILED {input_file}"
+                print(f"[{done + failed}/{len(todo)}] {status}")
+
+        elapsed = time.perf_counter() - started
+        print(f"\nConverted {done} file(s), {failed} failed, {skipped} skipped in {elapsed:.1f}s")
+        if elapsed > 0 and done:
+            summary = (f"Throughput: {done / elapsed:.2f} files/s, "
+                       f"{input_bytes / elapsed / 1024 / 1024:.1f} MB/s in, "
+                       f"{output_bytes / elapsed / 1024 / 1024:.1f} MB/s out")
+            if frames:
+                summary += f", {frames / elapsed:.1f} frames/s"
+            print(summary)
+        return failed == 0
+
+
 if __name__ == "__main__":
     # Command line argument parsing
     parser = argparse.ArgumentParser(description='Video converter')
-    parser.add_argument('-c', action='store_true', help='convert only')
-    parser.add_argument('-i', required=True, help='input video')
-    parser.add_argument('-o', required=True, help='output mjpg video')
+    parser.add_argument('-c', action='store_true', help='convert only: keep the plain ffmpeg MJPEG output')
+    parser.add_argument('-i', help='input video')
+    parser.add_argument('-o', help='output mjpg video')
+    parser.add_argument('-b', '--batch', help='directory or manifest of input videos to convert')
+    parser.add_argument('-d', '--output-dir', default='converted', help='output directory in batch mode')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='concurrent conversions in batch mode')
+    parser.add_argument('-s', '--segment-seconds', type=float,
+                        help='split inputs longer than this into segments converted in parallel')
+    parser.add_argument('-l', '--ladder', action='store_true',
+                        help='also convert lower renditions (' + ', '.join(r['name'] for r in DEFAULT_LADDER[1:]) +
+                             ') for adaptive streaming')
+    parser.add_argument('-t', '--thumbnails', action='store_true',
+                        help='also build a thumbnail track for scrub previews')
     args = parser.parse_args()
 
+    if args.thumbnails and args.c:
+        parser.error('--thumbnails needs the custom MJPG format, not -c')
+
+    # Initialize converter
+    converter = VideoConverter()
+
+    if args.batch:
+        if args.jobs and args.jobs > 1:
+            # The pool provides the parallelism, keep each ffmpeg on one thread
+            converter.set_parameter('threads', '1')
+        batch = BatchConverter(converter, args.output_dir, args.jobs, args.segment_seconds, args.c,
+                               DEFAULT_LADDER if args.ladder else None, args.thumbnails)
+        sys.exit(0 if batch.run(BatchConverter.collect_inputs(args.batch, args.output_dir)) else 1)
+
+    if not args.i or not args.o:
+        parser.error('-i and -o are required unless --batch is given')
+
     # Print parameters
     print(f"Convert only: {args.c}")
     print(f"Input file: {args.i}")
     print(f"Output file: {args.o}")
 
-    # Initialize converter
-    converter = VideoConverter()
-
     # Perform conversion
-    result = converter.convert_video(args.i, args.o)
+    if args.ladder:
+        result = converter.convert_ladder(args.i, args.o, convert_only=args.c)
+    else:
+        result = converter.convert_video(args.i, args.o, convert_only=args.c)
     
+    if result and args.thumbnails:
+        info = converter.probe_video(args.i)
+        thumbs = build_thumbnails(result, force=True, frame_rate=info['frame_rate'] if info else None)
+        print(f"Thumbnail track: {thumbs} thumbnails")
+
     if result:
         print(f"Successfully converted video to: {result}")
         sys.exit(0)
     else:
         print("Conversion failed")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -1,76 +1,128 @@
-from VideoConverter import VideoConverter
+from FrameCache import shared_cache
+from TranscodeCache import shared_transcodes, TranscodeJob
+from FrameIndex import load_index, save_index, scan_frame_positions, read_frame_rate
 import os
+import mmap
+
+# How long SETUP waits for the first frame of a progressive conversion
+FIRST_FRAME_TIMEOUT = 10.0
+# Used when the frame index does not record the source's frame rate
+DEFAULT_FRAME_RATE = 20.0
 
 class VideoStream:
-    def __init__(self, filename):
+    def __init__(self, filename, cache=shared_cache, use_mmap=False, transcodes=shared_transcodes,
+                 progressive=False):
         self.original_filename = filename
+        self.options = dict(cache=cache, use_mmap=use_mmap, transcodes=transcodes, progressive=progressive)
         self.frameNum = 0
         self.converted_file = None
+        self.job = None
+        self.frame_rate = DEFAULT_FRAME_RATE
+        self.cache = cache
+        self.map = None
+        self.view = None
         
         try:
             # Check if file needs conversion
             if not filename.lower().endswith(('.mjpeg', '.mjpg')):
                 print(f"Input file {filename} is not in MJPEG format. Converting...")
-                converter = VideoConverter()
-                self.converted_file = f"{os.path.splitext(filename)[0]}_converted.mjpg"
                 
-                # Perform conversion
-                result = converter.convert_video(filename, self.converted_file)
-                if result:
+                # Reuse a cached conversion or join one already running
+                source = transcodes.open(filename, progressive=progressive)
+                if isinstance(source, TranscodeJob):
+                    self.job = source
+                    self.job.wait(frames=0, timeout=FIRST_FRAME_TIMEOUT)
+                    if self.job.done and not self.job.succeeded:
+                        raise IOError("Video conversion failed")
+                    print("Streaming while converting")
+                elif source:
                     print("Conversion successful")
-                    self.filename = self.converted_file
+                    self.converted_file = source
                 else:
                     raise IOError("Video conversion failed")
+                self.filename = self.converted_file
             else:
                 self.filename = filename
             
-            self.file = open(self.filename, 'rb')
-            self.frame_positions = [0]
-            self.cache_frame_positions()
+            if self.job:
+                # The job renames its output when it finishes, open it under its lock
+                with self.job.condition:
+                    self.filename = self.converted_file = self.job.path
+                    self.file = open(self.filename, 'rb')
+                # Growing file: frames are read from disk and indexed by the job
+                use_mmap = use_mmap and self.job.done
+            else:
+                self.file = open(self.filename, 'rb')
+            stat = os.fstat(self.file.fileno())
+            self.cache_key = (os.path.abspath(self.filename), stat.st_mtime_ns)
+            if use_mmap:
+                # Frames are served as memoryview slices of the mapping,
+                # the page cache already shares them between sessions
+                self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.view = memoryview(self.map)
+                self.cache = None
+            if self.job:
+                self.frame_positions = self.job.frame_positions
+                self.frame_rate = self.job.frame_rate or DEFAULT_FRAME_RATE
+            else:
+                self.frame_positions = [0]
+                self.cache_frame_positions()
             
         except Exception as e:
             print(f"Error initializing VideoStream: {e}")
-            if self.converted_file and os.path.exists(self.converted_file):
-                try:
-                    os.remove(self.converted_file)
-                except:
-                    pass
             raise IOError
         
     def cache_frame_positions(self):
-        self.frame_positions = [0]
-        self.file.seek(0)
-        
-        while True:
-            try:
-                # Read 5-byte ASCII size header
-                size_str = self.file.read(5)
-                if not size_str or len(size_str) != 5:
-                    break
-                    
-                frame_size = int(size_str.decode('ascii'))
-                current_pos = self.file.tell()
-                self.frame_positions.append(current_pos + frame_size)
-                self.file.seek(frame_size, 1)
-                
-            except Exception as e:
-                break
-                
-        self.file.seek(0)
+        # Reuse the on-disk index when it is still valid for this file
+        stat = os.fstat(self.file.fileno())
+        index = load_index(self.filename, stat)
+        if index is None:
+            # Keep the frame rate recorded by the converter when rebuilding
+            index = scan_frame_positions(self.file), read_frame_rate(self.filename)
+            save_index(self.filename, index[0], stat, index[1])
+        self.frame_positions, frame_rate = index
+        self.frame_rate = frame_rate or DEFAULT_FRAME_RATE
         
+    def reopen(self):
+        """Open another, independently positioned stream of the same source.
+
+        The source goes through the transcode cache again, so a conversion
+        that finished since is read from its cached output and one still
+        running is joined rather than read from its temporary file.
+        """
+        return VideoStream(self.original_filename, **self.options)
+
     def nextFrame(self):
+        index = self.frameNum
+        if index >= len(self.frame_positions) - 1:
+            return None    # end of file, or not converted yet
+
+        key = (self.cache_key, index)
+        frame_data = self.cache.get(key) if self.cache else None
+        if frame_data is None:
+            frame_data = self._read_frame(index)
+            if frame_data is None:
+                return None
+            if self.cache:
+                self.cache.put(key, frame_data)
+
+        self.frameNum += 1
+        return frame_data
+
+    def _read_frame(self, index):
+        """Read the payload of a frame straight from its cached position."""
         try:
-            size_str = self.file.read(5)
-            if not size_str or len(size_str) != 5:
+            start = self.frame_positions[index] + 5    # skip 5-byte size header
+            frame_size = self.frame_positions[index + 1] - start
+            if self.view is not None:
+                frame_data = self.view[start:start + frame_size]
+                if len(frame_data) == frame_size:
+                    return frame_data
                 return None
-            
-            frame_size = int(size_str.decode('ascii'))
+            self.file.seek(start)
             frame_data = self.file.read(frame_size)
-            
             if len(frame_data) == frame_size:
-                self.frameNum += 1
                 return frame_data
-                
         except:
             pass
         return None
@@ -78,24 +130,48 @@ class VideoStream:
     def frameNbr(self):
         return self.frameNum
     
+    def byte_rate(self):
+        """Average bytes per second of the frames available so far, at the stream's frame rate."""
+        frames = len(self.frame_positions) - 1
+        if frames <= 0:
+            return 0.0
+        return (self.frame_positions[-1] - self.frame_positions[0]) / frames * self.frame_rate
+
     def get_total_frames(self):
-        return len(self.frame_positions) - 1
+        available = len(self.frame_positions) - 1
+        if self.job and not self.job.done:
+            return max(available, self.job.expected_frames)
+        return available
     
     def set_frame(self, frame_number):
         try:
             if 0 <= frame_number < len(self.frame_positions):
-                self.file.seek(self.frame_positions[frame_number])
+                # Frames are read by index, so seeking only moves the cursor
                 self.frameNum = frame_number
                 return True
             return False
         except:
             return False
             
+    def close_map(self):
+        """Release the memory map, if any."""
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass    # frames still referenced elsewhere, freed with them
+            self.map = None
+
+    def close(self):
+        """Release the memory map and the file handle, the stream can no longer be read."""
+        self.close_map()
+        self.file.close()
+
     def __del__(self):
         try:
-            self.file.close()
-            # Clean up converted file if it exists
-            if self.converted_file and os.path.exists(self.converted_file):
-                os.remove(self.converted_file)
+            self.close()
         except:
             pass
\ No newline at end of file